@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query
 from db import db
-import sqlite3
 
 
-app = FastAPI()
+@asynccontextmanager
+async def _ciclo_de_vida(app: FastAPI):
+    # a API pode subir antes do robô: cria a tabela e aplica as migrações
+    # pendentes (ex.: coluna `versao` do /changes) antes de atender
+    db.init_db()
+    yield
+
+
+app = FastAPI(lifespan=_ciclo_de_vida)
+
+MAX_IDS = 500           # OS por chamada em GET /os?ids=
+MAX_MUDANCAS = 1000     # itens por página do feed /changes
 
 
 @app.get("/overview")
@@ -11,22 +23,28 @@ def overview():
     """
         Retorna um JSON com a contagem de OS em cada status.
 
-        Chamadas internas:
-          db.list_by_status(("pendente",)) — retorna lista de OS pendentes
-          db.list_by_status(("sucesso",)) — retorna lista de OS com sucesso
-          db.list_by_status(("falha",)) — retorna lista de OS com falha
+        Chamada interna:
+          db.contar_por_status() — uma única consulta GROUP BY status
 
         Resposta:
           {
-            "pendentes": <int>,
-            "sucesso":   <int>,
-            "falha":     <int>
+            "pendentes":  <int>,
+            "sucesso":    <int>,
+            "falha":      <int>,
+            "aguardando": <int>,
+            "em_lotes":   <int>,
+            "total":      <int>
           }
         """
-    pend = len(db.list_by_status(("pendente",)))
-    ok = len(db.list_by_status(("sucesso",)))
-    falhas = len(db.list_by_status(("falha",)))
-    return {"pendentes": pend, "sucesso": ok, "falha": falhas}
+    n = db.contar_por_status()
+    return {
+        "pendentes": n.get("pendente", 0),
+        "sucesso": n.get("sucesso", 0),
+        "falha": n.get("falha", 0),
+        "aguardando": n.get("aguardando", 0),
+        "em_lotes": n.get("em_lotes", 0),
+        "total": sum(n.values()),
+    }
 
 
 @app.get("/os/{os_id}")
@@ -38,18 +56,57 @@ def get_os(os_id: int):
           os_id: int — identificador da OS
 
         Funcionamento:
-          - Abre uma conexão SQLite apontando para db.DB
-          - Configura row_factory para sqlite3.Row (permite dict(row))
-          - Executa SELECT * FROM os_downloads WHERE os_id=?
+          - db.get_os(os_id), na conexão persistente da thread (sem abrir
+            uma conexão nova por chamada)
           - Se encontrar: retorna todos os campos como dicionário
           - Se não: retorna {"erro": "não encontrada"}
+        """
+    reg = db.get_os(os_id)
+    return reg if reg else {"erro": "não encontrada"}
+
 
-        Atenção à configuração:
-          * Verifique em db.DB se o caminho para o arquivo .sqlite fica num .env
-            (evite ter algo como "/caminho/absoluto/qualquer.sqlite" no código).
+@app.get("/os")
+def get_varias(ids: str = Query(..., description="IDs separados por vírgula, ex.: 101,102,103")):
+    """
+        Detalhes de várias OS numa chamada (uma consulta IN).
+
+        Parâmetros:
+          ids: str — até MAX_IDS IDs separados por vírgula
+
+        Resposta:
+          {"itens": [<OS>, …], "faltando": [<ids inexistentes>]}
+        """
+    try:
+        lista = sorted({int(i) for i in ids.split(",") if i.strip()})
+    except ValueError:
+        raise HTTPException(422, "ids deve conter apenas números separados por vírgula")
+    if len(lista) > MAX_IDS:
+        raise HTTPException(422, f"no máximo {MAX_IDS} IDs por chamada")
+
+    itens = db.get_many(lista)
+    achados = {r["os_id"] for r in itens}
+    return {"itens": itens, "faltando": [i for i in lista if i not in achados]}
+
+
+@app.get("/changes")
+def changes(since: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=MAX_MUDANCAS)):
+    """
+        Feed de mudanças para sincronização incremental (ex.: Cloud_front).
+
+        Parâmetros:
+          since: int — cursor da última chamada (0 = desde o início)
+          limit: int — máximo de OS por página
+
+        Cada inclusão ou alteração de OS ganha uma `versao` crescente (ver
+        db._migracao_5 e _migracao_6); o feed devolve as OS com versao > since.
+
+        Resposta:
+          {
+            "cursor": <int>,   ← passar como `since` na próxima chamada
+            "itens":  [<OS>, …],
+            "mais":   <bool>   ← True = há mais páginas já disponíveis
+          }
         """
-    with sqlite3.connect(db.DB) as c:
-        c.row_factory = sqlite3.Row
-        cur = c.execute("SELECT * FROM os_downloads WHERE os_id=?", (os_id,))
-        row = cur.fetchone()
-        return dict(row) if row else {"erro": "não encontrada"}
+    itens = db.mudancas(since, limit)
+    cursor = itens[-1]["versao"] if itens else since
+    return {"cursor": cursor, "itens": itens, "mais": len(itens) == limit}
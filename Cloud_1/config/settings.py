@@ -1,3 +1,4 @@
+import socket
 from pathlib import Path
 from dotenv import load_dotenv
 from pydantic import Field
@@ -39,6 +40,77 @@ class Settings(BaseSettings):
     sleep_seconds: int = 200
     max_attempts: int = 4
 
+    # ——— cadência adaptativa: entre ciclos, só uma sonda do topo do grid;
+    #     o ciclo completo roda quando há ID novo ou retentativa vencida
+    cadencia_adaptativa: bool = False        # False = sleep_seconds fixo
+    cadencia_min_s: int = 15
+    cadencia_max_s: int = 600                # teto fora do expediente
+    cadencia_max_expediente_s: int = 60      # teto em dias úteis, no expediente
+    expediente_inicio: int = 8               # hora local
+    expediente_fim: int = 18
+    ciclo_completo_max_s: int = 1800         # ciclo completo ao menos a cada N s
+
+    # ——— pool de navegadores (1 = um único Chrome, comportamento original)
+    n_workers: int = 1
+
+    # ——— modo de download dos anexos: "clique" (original) | "http"
+    download_modo: str = "clique"
+    http_paralelo: int = 6          # downloads HTTP simultâneos por OS
+    http_timeout: int = 120         # segundos de leitura por anexo
+
+    # ——— conclusão de download pelos eventos do DevTools (senão, polling da pasta)
+    download_eventos: bool = False
+
+    # ——— store de anexos endereçado por SHA-256 (None = desligado)
+    #     baixados/separados viram hardlinks para os blobs (cópia se não der)
+    blob_dir: Path | None = Field(None, alias="BLOB_DIR")
+    blob_poda_intervalo_s: int = 6 * 3600   # remove blobs sem hardlink (0 = nunca)
+    blob_poda_idade_s: int = 3600           # … e sem uso há pelo menos N s
+
+    # ——— navegador persistente entre ciclos
+    driver_max_os: int = 150             # recicla o Chrome após N OS
+    driver_max_memoria_mb: int = 1024    # … ou quando o heap JS da aba passar disso
+    driver_reserva: bool = False         # mantém um 2º Chrome logado de reserva
+
+    # ——— conclusão da OS (mover, copiar, TXT, banco, fila) em segundo plano,
+    #     enquanto o navegador já abre a próxima OS
+    pipeline: bool = False
+
+    # ——— publica cada anexo gravado na fila `anexos_queue` (pré-triagem do Cloud_2)
+    publicar_anexos: bool = False
+
+    # ——— Chrome enxuto: headless e sem baixar o que a automação não usa
+    chrome_headless: bool = False
+    chrome_bloquear_recursos: bool = False      # imagens + padrões abaixo
+    chrome_bloqueios: list[str] = [
+        "*.woff", "*.woff2", "*.ttf", "*.otf",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*hotjar.com*", "*nr-data.net*", "*newrelic.com*", "*pendo.io*",
+    ]
+
+    # ——— OS acima do limite de anexos baixadas em janelas (False = marca "excesso")
+    lotes: bool = False
+    lote_tamanho: int = 20          # anexos por janela
+    lote_orcamento_s: int = 300     # tempo máximo de uma janela (segundos)
+
+    # ——— descoberta de OS: "grid" (DOM, original) | "api" (XHR JSON do portal)
+    descoberta_modo: str = "grid"
+    portal_api_padrao: str = "service-request"   # trecho da URL do XHR da listagem
+    portal_api_max_paginas: int = 20
+
+    # ——— vários processos/hosts sobre o mesmo banco: cada OS é "reivindicada"
+    #     com posse (lease) renovada por heartbeat, em vez da fatia os_id % N
+    distribuido: bool = False
+    # estável entre reinícios (nomeia perfil e pastas); o pid entra só no dono
+    # da posse. Mais de um processo na mesma máquina: um WORKER_ID para cada
+    worker_id: str = Field(default_factory=socket.gethostname)
+    lease_s: int = 900              # posse sem renovação vence após N s
+    lease_heartbeat_s: int = 60     # intervalo de renovação
+    semeador: bool = True           # False = este processo não semeia IDs nem lacunas
+
+    # ——— navegadores remotos num Selenium Grid (None = Chrome local)
+    selenium_grid_url: str | None = None     # ex.: http://grid:4444/wd/hub
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -50,5 +122,7 @@ settings = Settings()
 for p in (settings.download_dir,
           settings.baixados_dir,
           settings.separados_dir,
-          settings.chrome_profile):
-    p.mkdir(parents=True, exist_ok=True)
+          settings.chrome_profile,
+          settings.blob_dir):
+    if p is not None:
+        p.mkdir(parents=True, exist_ok=True)
@@ -1,24 +1,63 @@
 import sqlite3
 import datetime
+import threading
 from datetime import timezone
 from contextlib import contextmanager
+from typing import Iterable
 from config.settings import settings
 
 # arquivo SQLite
 DB = settings.db_path
 
+BUSY_TIMEOUT_MS = 5000      # espera por lock antes de "database is locked"
+CACHED_STATEMENTS = 256     # statements preparados mantidos por conexão
+
+# uma conexão persistente por thread (workers do pool, threads do FastAPI…)
+_local = threading.local()
+
 
 # ────────────────────────────────────────────────
 # utilitários
 # ────────────────────────────────────────────────
+def _abrir() -> sqlite3.Connection:
+    """
+    Abre a conexão da thread atual já configurada:
+      • journal_mode=WAL      → leitores (Cloud_front, API) não bloqueiam o bot
+      • synchronous=NORMAL    → fsync só nos checkpoints do WAL
+      • busy_timeout          → espera o lock em vez de falhar na hora
+      • cached_statements     → SQL repetido não é recompilado
+    """
+    conn = sqlite3.connect(DB, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
 @contextmanager
 def _conn():
-    conn = sqlite3.connect(DB)
-    conn.row_factory = sqlite3.Row
+    """
+    Entrega a conexão persistente da thread (criada na primeira chamada).
+    Em caso de erro desfaz a transação aberta, para a conexão seguir utilizável.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _abrir()
     try:
         yield conn
-    finally:
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def fechar():
+    """Fecha a conexão da thread atual (ex.: ao encerrar um worker)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
         conn.close()
+        _local.conn = None
 
 
 def _now_iso() -> str:
@@ -26,6 +65,19 @@ def _now_iso() -> str:
     return datetime.datetime.now(timezone.utc).isoformat(timespec="seconds")
 
 
+def _now_ts() -> int:
+    """Retorna timestamp UTC em segundos desde a época (epoch)."""
+    return int(datetime.datetime.now(timezone.utc).timestamp())
+
+
+def _iso_to_ts(iso: str) -> int:
+    """Converte ISO‑8601 em epoch; sem fuso explícito assume UTC."""
+    dt = datetime.datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
 # ────────────────────────────────────────────────
 # schema
 # ────────────────────────────────────────────────
@@ -34,12 +86,14 @@ def init_db():
     Cria (se faltar) a tabela `os_downloads`:
 
       os_id       PK
-      status      pendente | aguardando | sucesso | falha
+      status      pendente | aguardando | em_lotes | sucesso | falha
       tentativas quantas vezes falhou
       last_try   última vez que tentamos abrir (UTC)
       created_at inclusão
       updated_at última alteração
       (demais colunas: dados da OS)
+
+    e aplica as migrações pendentes (ver `_MIGRACOES`).
     """
     with _conn() as c:
         c.execute(
@@ -61,6 +115,170 @@ def init_db():
             """
         )
         c.commit()
+        _migrar(c)
+
+
+# ────────────────────────────────────────────────
+# migrações (versão guardada em PRAGMA user_version)
+# ────────────────────────────────────────────────
+def _colunas(c, tabela: str) -> set[str]:
+    return {r["name"] for r in c.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _migracao_1(c):
+    """
+    Timestamps em epoch (INTEGER) + índices das consultas do loop:
+
+      created_ts   espelho inteiro de created_at
+      last_try_ts  espelho inteiro de last_try
+
+    As colunas ISO continuam sendo gravadas (o Cloud_front filtra por elas);
+    as consultas do bot usam só as inteiras, cobertas pelos índices
+    (status, last_try_ts) e (status, created_ts).
+    """
+    cols = _colunas(c, "os_downloads")
+    for col in ("created_ts", "last_try_ts"):
+        if col not in cols:
+            c.execute(f"ALTER TABLE os_downloads ADD COLUMN {col} INTEGER")
+    c.execute("""
+        UPDATE os_downloads
+           SET created_ts  = CAST(strftime('%s', created_at) AS INTEGER),
+               last_try_ts = CAST(strftime('%s', last_try)   AS INTEGER)
+         WHERE created_ts IS NULL OR last_try_ts IS NULL
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS ix_os_status_last_try ON os_downloads(status, last_try_ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_os_status_created ON os_downloads(status, created_ts)")
+
+
+def _migracao_2(c):
+    """
+    Agendamento de retentativas por OS:
+
+      next_attempt_at  epoch a partir do qual a OS pode ser retentada
+                       (NULL em aguardando/falha = não retentar)
+
+    OS já em espera herdam o cooldown fixo antigo (15 min após last_try),
+    exceto as de "excesso de anexos", que nunca eram retentadas.
+    """
+    if "next_attempt_at" not in _colunas(c, "os_downloads"):
+        c.execute("ALTER TABLE os_downloads ADD COLUMN next_attempt_at INTEGER")
+    c.execute("""
+        UPDATE os_downloads
+           SET next_attempt_at = last_try_ts + 15 * 60
+         WHERE status IN ('aguardando', 'falha')
+           AND NOT (status = 'falha' AND lower(coalesce(motivo, '')) LIKE '%excesso de anexos%')
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS ix_os_status_next ON os_downloads(status, next_attempt_at)")
+
+
+def _migracao_3(c):
+    """
+    Estado por anexo, para retomar OS baixadas pela metade:
+
+      os_anexos(os_id, anexo_id)  anexo_id = id do elemento do anexo no portal
+        nome        nome do arquivo na pasta destino
+        tamanho     bytes
+        sha256      hash do conteúdo (detecta arquivo corrompido/trocado)
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS os_anexos (
+            os_id       INTEGER NOT NULL,
+            anexo_id    TEXT    NOT NULL,
+            nome        TEXT    NOT NULL,
+            tamanho     INTEGER NOT NULL,
+            sha256      TEXT    NOT NULL,
+            updated_at  TEXT,
+            PRIMARY KEY (os_id, anexo_id)
+        )
+    """)
+
+
+def _migracao_4(c):
+    """
+    Posse (lease) da OS para workers em vários processos/hosts:
+
+      lease_owner   id do worker que está com a OS (settings.worker_id-pid/wN)
+      lease_expira  epoch em que a posse vence sem renovação (heartbeat)
+
+    Posse vencida vale como livre: a OS de um worker que caiu volta para a
+    fila dos demais.
+    """
+    cols = _colunas(c, "os_downloads")
+    if "lease_owner" not in cols:
+        c.execute("ALTER TABLE os_downloads ADD COLUMN lease_owner TEXT")
+    if "lease_expira" not in cols:
+        c.execute("ALTER TABLE os_downloads ADD COLUMN lease_expira INTEGER")
+
+
+# colunas cuja alteração gera uma nova versão da OS (posse/lease fica de fora:
+# o heartbeat não deve aparecer como mudança)
+_COLUNAS_VERSIONADAS = ("status", "tentativas", "last_try", "apelido", "assunto", "descricao",
+                        "anexos_total", "lido", "motivo", "next_attempt_at")
+
+
+def _migracao_5(c):
+    """
+    Cursor de mudanças (feed `/changes` da API de status):
+
+      versao  número crescente, global na tabela, renovado a cada inclusão
+              ou alteração da OS (triggers — vale para qualquer processo que
+              grave no banco, inclusive o Cloud_front marcando `lido`)
+
+    OS existentes recebem versões em ordem de os_id.
+    """
+    if "versao" not in _colunas(c, "os_downloads"):
+        c.execute("ALTER TABLE os_downloads ADD COLUMN versao INTEGER")
+    c.execute("""
+        UPDATE os_downloads
+           SET versao = os_id - (SELECT MIN(os_id) FROM os_downloads) + 1
+         WHERE versao IS NULL
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS ix_os_versao ON os_downloads(versao)")
+    proxima = "(SELECT COALESCE(MAX(versao), 0) + 1 FROM os_downloads)"
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS tr_os_versao_ins AFTER INSERT ON os_downloads
+        BEGIN
+            UPDATE os_downloads SET versao = {proxima} WHERE os_id = NEW.os_id;
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS tr_os_versao_upd
+        AFTER UPDATE OF {", ".join(_COLUNAS_VERSIONADAS)} ON os_downloads
+        BEGIN
+            UPDATE os_downloads SET versao = {proxima} WHERE os_id = NEW.os_id;
+        END
+    """)
+
+
+def _migracao_6(c):
+    """
+    A versão só avança quando algum campo versionado muda de fato: regravar
+    o mesmo valor (ex.: `atualizar_metadados` a cada ciclo) não entra no feed.
+    """
+    mudou = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in _COLUNAS_VERSIONADAS)
+    proxima = "(SELECT COALESCE(MAX(versao), 0) + 1 FROM os_downloads)"
+    c.execute("DROP TRIGGER IF EXISTS tr_os_versao_upd")
+    c.execute(f"""
+        CREATE TRIGGER tr_os_versao_upd
+        AFTER UPDATE OF {", ".join(_COLUNAS_VERSIONADAS)} ON os_downloads
+        WHEN {mudou}
+        BEGIN
+            UPDATE os_downloads SET versao = {proxima} WHERE os_id = NEW.os_id;
+        END
+    """)
+
+
+_MIGRACOES = [_migracao_1, _migracao_2, _migracao_3, _migracao_4, _migracao_5,
+              _migracao_6]
+
+
+def _migrar(c):
+    """Aplica, em ordem e uma única vez, as migrações ainda não aplicadas."""
+    versao = c.execute("PRAGMA user_version").fetchone()[0]
+    for n, migracao in enumerate(_MIGRACOES[versao:], start=versao + 1):
+        migracao(c)
+        c.execute(f"PRAGMA user_version = {n}")
+        c.commit()
 
 
 # ────────────────────────────────────────────────
@@ -73,6 +291,20 @@ def exists(os_id: int) -> bool:
         return cur.fetchone() is not None
 
 
+_SQL_UPSERT = """
+    INSERT INTO os_downloads
+        (os_id, status, tentativas, last_try, created_at, updated_at,
+         last_try_ts, created_ts)
+    VALUES (?, ?, 0, ?, ?, ?, ?, ?)
+    ON CONFLICT(os_id)
+    DO UPDATE SET
+        status      = excluded.status,
+        last_try    = excluded.last_try,
+        last_try_ts = excluded.last_try_ts,
+        updated_at  = excluded.updated_at
+"""
+
+
 def upsert_os(os_id: int, status: str = "pendente", *, last_try: str | datetime.datetime | None = None):
     """
     Insere nova OS OU atualiza status quando já existir.
@@ -91,20 +323,89 @@ def upsert_os(os_id: int, status: str = "pendente", *, last_try: str | datetime.
     )
 
     with _conn() as c:
-        c.execute(
-            """
-            INSERT INTO os_downloads
-                (os_id, status, tentativas, last_try, created_at, updated_at)
-            VALUES (?,     ?,      0,          ?,       ?,          ?)
-            ON CONFLICT(os_id)
-            DO UPDATE SET
-                status     = excluded.status,
-                last_try   = excluded.last_try,
-                updated_at = excluded.updated_at
-            """,
-            (os_id, status, lt, now, now),
+        c.execute(_SQL_UPSERT, (os_id, status, lt, now, now, _iso_to_ts(lt), _iso_to_ts(now)))
+        c.commit()
+
+
+def upsert_many(os_ids: Iterable[int], status: str = "pendente") -> int:
+    """
+    Versão em lote de `upsert_os`: um único executemany numa só transação
+    (um fsync no total, em vez de um por ID).
+    Retorna quantos IDs foram enviados.
+    """
+    now, ts = _now_iso(), _now_ts()
+    linhas = [(os_id, status, now, now, now, ts, ts) for os_id in os_ids]
+    if not linhas:
+        return 0
+    with _conn() as c:
+        c.executemany(_SQL_UPSERT, linhas)
+        c.commit()
+    return len(linhas)
+
+
+def atualizar_metadados(itens: Iterable[dict]) -> None:
+    """
+    Grava apelido / assunto / anexos_total vindos da listagem do portal
+    (utils/portal_api.py) nas OS ainda não baixadas. Campos None não
+    sobrescrevem o que já existe.
+    """
+    linhas = [(i.get("apelido"), i.get("assunto"), i.get("anexos_total"), i["os_id"])
+              for i in itens]
+    if not linhas:
+        return
+    with _conn() as c:
+        c.executemany("""
+            UPDATE os_downloads
+               SET apelido      = COALESCE(?, apelido),
+                   assunto      = COALESCE(?, assunto),
+                   anexos_total = COALESCE(?, anexos_total)
+             WHERE os_id = ? AND status != 'sucesso'
+        """, linhas)
+        c.commit()
+
+
+def max_os_id() -> int | None:
+    """Maior os_id já registrado (None se a tabela estiver vazia)."""
+    with _conn() as c:
+        return c.execute("SELECT MAX(os_id) FROM os_downloads").fetchone()[0]
+
+
+def preencher_lacunas(status: str = "pendente") -> int:
+    """
+    Insere, com `status`, todo os_id ausente entre o menor e o maior já
+    registrados — tudo dentro do SQLite:
+
+      • LEAD() acha cada par de IDs vizinhos com salto > 1 (as lacunas)
+      • a CTE recursiva expande cada faixa nos IDs que faltam
+      • INSERT … SELECT grava tudo numa transação
+
+    Retorna quantos IDs foram inseridos.
+    """
+    now, ts = _now_iso(), _now_ts()
+    sql = """
+        WITH RECURSIVE
+        faixas(ini, fim) AS (
+            SELECT os_id + 1, prox - 1
+            FROM (SELECT os_id, LEAD(os_id) OVER (ORDER BY os_id) AS prox
+                  FROM os_downloads)
+            WHERE prox - os_id > 1
+        ),
+        faltantes(os_id, fim) AS (
+            SELECT ini, fim FROM faixas
+            UNION ALL
+            SELECT os_id + 1, fim FROM faltantes WHERE os_id < fim
         )
+        INSERT INTO os_downloads
+            (os_id, status, tentativas, last_try, created_at, updated_at,
+             last_try_ts, created_ts)
+        SELECT os_id, ?, 0, ?, ?, ?, ?, ? FROM faltantes
+    """
+    with _conn() as c:
+        c.execute(sql, (status, now, now, now, ts, ts))
+        # cursor.rowcount não é preenchido para comandos que começam com WITH
+        inseridos = c.execute("SELECT changes()").fetchone()[0]
         c.commit()
+        return inseridos
 
 
 def mark_status(os_id: int, status: str, *, inc_try: bool = False, extra: dict | None = None):
@@ -114,8 +415,8 @@ def mark_status(os_id: int, status: str, *, inc_try: bool = False, extra: dict |
     Aceita colunas extras via dicionário.
     """
     now = _now_iso()
-    sets = ["status = ?", "updated_at = ?", "last_try = ?"]
-    params: list = [status, now, now]
+    sets = ["status = ?", "updated_at = ?", "last_try = ?", "last_try_ts = ?"]
+    params: list = [status, now, now, _now_ts()]
 
     if inc_try:
         sets.insert(1, "tentativas = tentativas + 1")
@@ -131,10 +432,23 @@ def mark_status(os_id: int, status: str, *, inc_try: bool = False, extra: dict |
         c.commit()
 
 
-def list_by_status(statuses: tuple[str, ...], max_try: int | None = None) -> list[int]:
+def _cond_shard(shard: tuple[int, int] | None) -> tuple[str, list]:
+    """
+    Filtro de fatia para o pool de workers: shard=(total, indice) seleciona
+    apenas os IDs com os_id % total == indice. None → sem filtro.
+    """
+    if shard is None:
+        return "", []
+    total, indice = shard
+    return "AND os_id % ? = ?", [total, indice]
+
+
+def list_by_status(statuses: tuple[str, ...], max_try: int | None = None,
+                   *, shard: tuple[int, int] | None = None) -> list[int]:
     """
     Lista IDs cujo `status` esteja em `statuses`.
     Se max_try ≠ None, filtra tentativas < max_try.
+    Se shard ≠ None, devolve só a fatia do worker (ver `_cond_shard`).
     """
     placeholders = ",".join("?" * len(statuses))
     params: list = list(statuses)
@@ -144,40 +458,198 @@ def list_by_status(statuses: tuple[str, ...], max_try: int | None = None) -> lis
         cond_try = "AND tentativas < ?"
         params.append(max_try)
 
+    cond_shard, params_shard = _cond_shard(shard)
+    params += params_shard
+
     sql = (
         f"SELECT os_id FROM os_downloads "
-        f"WHERE status IN ({placeholders}) {cond_try} "
-        f"ORDER BY created_at"
+        f"WHERE status IN ({placeholders}) {cond_try} {cond_shard} "
+        f"ORDER BY created_ts"
     )
     with _conn() as c:
         cur = c.execute(sql, params)
         return [row["os_id"] for row in cur.fetchall()]
 
 
-def list_for_retry(status: str, max_try: int, cooldown_minutes: int) -> list[int]:
+# OS que o ciclo deve visitar agora (parâmetros: agora_ts, max_try)
+# 'aguardando' tem limite próprio (backoff.POLITICAS["grid"]): ao esgotar,
+# o reagendamento grava next_attempt_at NULL e a OS sai da fila
+_COND_DEVIDAS = """
+    (status IN ('pendente', 'em_lotes')
+     OR (status IN ('aguardando', 'falha')
+         AND next_attempt_at <= ?
+         AND (status = 'aguardando' OR tentativas < ?)))
+"""
+
+
+_ORDEM_DEVIDAS = """
+    CASE status WHEN 'pendente' THEN 0 WHEN 'em_lotes' THEN 2 ELSE 1 END,
+    CASE WHEN status IN ('aguardando', 'falha') THEN next_attempt_at ELSE created_ts END
+"""
+
+
+def tem_devidas(max_try: int, *, shard: tuple[int, int] | None = None) -> bool:
+    """True se `list_due` traria ao menos uma OS (consulta barata, LIMIT 1)."""
+    cond_shard, params_shard = _cond_shard(shard)
+    sql = f"SELECT 1 FROM os_downloads WHERE {_COND_DEVIDAS} {cond_shard} LIMIT 1"
+    with _conn() as c:
+        return c.execute(sql, (_now_ts(), max_try, *params_shard)).fetchone() is not None
+
+
+def list_due(max_try: int, *, shard: tuple[int, int] | None = None) -> list[int]:
     """
-    IDs nesse `status` que:
-      • tentativas < max_try
-      • last_try <= agora - cooldown_minutes
+    Fila de trabalho do ciclo, em ordem de prioridade:
+
+      1) pendentes (OS novas), por created_ts
+      2) aguardando/falha com next_attempt_at vencido (falha também com
+         tentativas < max_try), pelo vencimento mais antigo
+      3) em_lotes (OS grandes baixadas por janelas), por created_ts
     """
-    sql = """
+    cond_shard, params_shard = _cond_shard(shard)
+    sql = f"""
         SELECT os_id
         FROM os_downloads
-        WHERE status = ?
-          AND tentativas < ?
-          AND datetime(last_try) <= datetime('now', ?)
-        ORDER BY created_at
+        WHERE {_COND_DEVIDAS}
+          {cond_shard}
+        ORDER BY {_ORDEM_DEVIDAS}
     """
-    offset = f"-{cooldown_minutes} minutes"
     with _conn() as c:
-        cur = c.execute(sql, (status, max_try, offset))
+        cur = c.execute(sql, (_now_ts(), max_try, *params_shard))
         return [row["os_id"] for row in cur.fetchall()]
 
 
-def get_motivo(os_id: int) -> str | None:
+def reivindicar(dono: str, duracao_s: int, max_try: int) -> int | None:
+    """
+    Toma posse da próxima OS devida (mesma ordem de `list_due`) que não
+    esteja com outro worker — ou cuja posse já venceu — por `duracao_s`.
+
+    Leitura e gravação correm numa transação BEGIN IMMEDIATE: dois workers
+    nunca saem com a mesma OS. Retorna o os_id (None = nada a fazer).
+    """
+    agora = _now_ts()
+    with _conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        row = c.execute(f"""
+            SELECT os_id FROM os_downloads
+             WHERE {_COND_DEVIDAS}
+               AND (lease_expira IS NULL OR lease_expira <= ?)
+             ORDER BY {_ORDEM_DEVIDAS}
+             LIMIT 1
+        """, (agora, max_try, agora)).fetchone()
+        if row is not None:
+            c.execute("UPDATE os_downloads SET lease_owner = ?, lease_expira = ? WHERE os_id = ?",
+                      (dono, agora + duracao_s, row["os_id"]))
+        c.commit()
+        return row["os_id"] if row else None
+
+
+def renovar_lease(os_id: int, dono: str, duracao_s: int) -> bool:
+    """Estende a posse (heartbeat). False se a OS não está mais com `dono`."""
     with _conn() as c:
-        cur = c.execute("SELECT motivo FROM os_downloads WHERE os_id = ?", (os_id,))
-        row = cur.fetchone()
-        if row:
-            return row["motivo"]
-    return None
+        cur = c.execute(
+            "UPDATE os_downloads SET lease_expira = ? WHERE os_id = ? AND lease_owner = ?",
+            (_now_ts() + duracao_s, os_id, dono))
+        c.commit()
+        return cur.rowcount > 0
+
+
+def liberar_lease(os_id: int, dono: str):
+    """Devolve a OS (só se ainda estiver com `dono`)."""
+    with _conn() as c:
+        c.execute("UPDATE os_downloads SET lease_owner = NULL, lease_expira = NULL "
+                  "WHERE os_id = ? AND lease_owner = ?", (os_id, dono))
+        c.commit()
+
+
+def agendar(os_id: int, quando_ts: int | None):
+    """Define next_attempt_at (epoch) da OS; None = não retentar."""
+    with _conn() as c:
+        c.execute("UPDATE os_downloads SET next_attempt_at = ? WHERE os_id = ?", (quando_ts, os_id))
+        c.commit()
+
+
+def reabrir_excesso_anexos(motivo: str) -> int:
+    """
+    Devolve à fila (pendente, tentativas zeradas) as OS em falha por
+    `motivo` — as de "excesso de anexos", que sem lotes nunca voltavam.
+    Retorna quantas foram reabertas.
+    """
+    with _conn() as c:
+        cur = c.execute("""
+            UPDATE os_downloads
+               SET status = 'pendente', tentativas = 0, next_attempt_at = NULL
+             WHERE status = 'falha' AND lower(coalesce(motivo, '')) LIKE ?
+        """, (f"%{motivo.lower()}%",))
+        c.commit()
+        return cur.rowcount
+
+
+def get_os(os_id: int) -> dict | None:
+    """Registro completo da OS como dicionário (None se não existir)."""
+    with _conn() as c:
+        row = c.execute("SELECT * FROM os_downloads WHERE os_id = ?", (os_id,)).fetchone()
+        return dict(row) if row else None
+
+
+def get_many(os_ids: Iterable[int]) -> list[dict]:
+    """Registros das OS informadas (as inexistentes são omitidas), por os_id."""
+    ids = list(os_ids)
+    if not ids:
+        return []
+    with _conn() as c:
+        rows = c.execute(
+            f"SELECT * FROM os_downloads WHERE os_id IN ({','.join('?' * len(ids))}) ORDER BY os_id",
+            ids,
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def contar_por_status() -> dict[str, int]:
+    """{status: quantidade} numa única consulta (GROUP BY)."""
+    with _conn() as c:
+        rows = c.execute("SELECT status, COUNT(*) AS n FROM os_downloads GROUP BY status").fetchall()
+    return {r["status"]: r["n"] for r in rows}
+
+
+def mudancas(desde: int, limite: int = 500) -> list[dict]:
+    """OS incluídas/alteradas depois da versão `desde`, em ordem de versão."""
+    with _conn() as c:
+        rows = c.execute(
+            "SELECT * FROM os_downloads WHERE versao > ? ORDER BY versao LIMIT ?",
+            (desde, limite),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def anexos_da_os(os_id: int) -> dict[str, dict]:
+    """Anexos já baixados da OS: {anexo_id: {"nome", "tamanho", "sha256"}}."""
+    with _conn() as c:
+        rows = c.execute(
+            "SELECT anexo_id, nome, tamanho, sha256 FROM os_anexos WHERE os_id = ?", (os_id,)
+        ).fetchall()
+    return {r["anexo_id"]: {"nome": r["nome"], "tamanho": r["tamanho"], "sha256": r["sha256"]}
+            for r in rows}
+
+
+def contar_anexos(os_ids: Iterable[int]) -> int:
+    """Total de anexos já baixados (registrados em os_anexos) das OS informadas."""
+    ids = list(os_ids)
+    if not ids:
+        return 0
+    with _conn() as c:
+        return c.execute(
+            f"SELECT COUNT(*) FROM os_anexos WHERE os_id IN ({','.join('?' * len(ids))})", ids
+        ).fetchone()[0]
+
+
+def registrar_anexo(os_id: int, anexo_id: str, nome: str, tamanho: int, sha256: str):
+    """Grava (ou substitui) o estado de um anexo baixado."""
+    with _conn() as c:
+        c.execute("""
+            INSERT INTO os_anexos (os_id, anexo_id, nome, tamanho, sha256, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(os_id, anexo_id) DO UPDATE SET
+                nome = excluded.nome, tamanho = excluded.tamanho,
+                sha256 = excluded.sha256, updated_at = excluded.updated_at
+        """, (os_id, anexo_id, nome, tamanho, sha256, _now_iso()))
+        c.commit()
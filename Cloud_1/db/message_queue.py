@@ -20,7 +20,8 @@ def _conn():
 
 def _init():
     """
-    Inicializa a tabela `queue` caso não exista.
+    Inicializa as tabelas `queue` (OS concluídas) e `anexos_queue`
+    (anexos individuais) caso não existam.
     Executa no carregamento do módulo.
     """
     with _conn() as c:
@@ -31,6 +32,15 @@ def _init():
               enqueued_at  TEXT DEFAULT CURRENT_TIMESTAMP
           )
         """)
+        c.execute("""
+          CREATE TABLE IF NOT EXISTS anexos_queue (
+              id           INTEGER PRIMARY KEY AUTOINCREMENT,
+              os_id        INTEGER,
+              caminho      TEXT,
+              sha256       TEXT,
+              enqueued_at  TEXT DEFAULT CURRENT_TIMESTAMP
+          )
+        """)
         c.commit()
 
 
@@ -53,6 +63,22 @@ def publish(os_id: int):
         c.commit()
 
 
+def publish_anexo(os_id: int, caminho: str, sha256: str):
+    """
+    Adiciona à fila de anexos um arquivo já gravado no destino, antes de a
+    OS inteira terminar. O evento de "OS completa" continua sendo `publish`.
+
+    Parâmetros:
+      os_id:   OS dona do anexo
+      caminho: caminho absoluto do arquivo em BAIXADOS_DIR
+      sha256:  hash do conteúdo
+    """
+    with _conn() as c:
+        c.execute("INSERT INTO anexos_queue (os_id, caminho, sha256) VALUES (?, ?, ?)",
+                  (os_id, caminho, sha256))
+        c.commit()
+
+
 def pull() -> int | None:
     """
     Remove e retorna o próximo `os_id` da fila, seguindo ordem FIFO.
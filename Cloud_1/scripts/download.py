@@ -1,6 +1,9 @@
+import os
 import time
 import json
 import shutil
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from selenium import webdriver
@@ -9,40 +12,95 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException
 from config.settings import settings
 from utils.logging_config import configure_logging
-from utils.helpers import espera_download, mover_arquivos, CSS, formatar_erro_usuario
+from utils.helpers import espera_download, CSS, formatar_erro_usuario
+from utils import http_download, blob_store, backoff, scraping, portal_api, grid
+from utils.download_events import MonitorDownloads
+from utils.driver_manager import GerenciadorDriver
+from utils.pipeline import Finalizador
+from utils.cadencia import Cadencia
+from utils.lease import Lease
 from scripts.login import run as do_login
 from db import db, message_queue
 
 log = configure_logging("download")
 
 # ─── Constantes de estratégia ──────────────────────────────────────────
-COOLDOWN_MIN = 15          # minutos entre retentativas
 N_INICIAL = 10          # IDs visíveis que serão semeados no 1º run
 MOTIVO_EXCESSO = "excesso de anexos"
 LIMITE_ANEXOS = 60
+# navegador fechado/sessão morta: troca o navegador e a OS não conta tentativa
+ERROS_SESSAO = (NoSuchWindowException, InvalidSessionIdException)
 
 HEARTBEAT = Path(__file__).resolve().parents[1] / "heartbeat.json"
 
+# último beat de cada worker (nome da thread) — o arquivo traz todos
+_BEATS: dict[str, dict] = {}
+_BEATS_LOCK = threading.Lock()
+_PRIORIDADE_STATUS = {"error": 2, "running": 1}
+
 
 def beat(msg: str = "ok", *, status: str = "idle"):
-    HEARTBEAT.write_text(json.dumps({
-        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
-        "status": status,
-        "msg": msg,
-    }, ensure_ascii=False))
+    """
+    Registra o estado do worker atual e regrava heartbeat.json com todos:
+
+      {"ts", "status", "msg"}  → resumo (o worker mais relevante: error >
+                                 running > idle), formato lido pelo Cloud_front
+      "workers"                → {"worker-0": {"ts", "status", "msg"}, …}
+
+    Grava num .tmp e troca com os.replace: quem lê nunca vê o arquivo pela metade.
+    """
+    agora = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+    with _BEATS_LOCK:
+        _BEATS[threading.current_thread().name] = {"ts": agora, "status": status, "msg": msg}
+        resumo = max(_BEATS.values(),
+                     key=lambda b: (_PRIORIDADE_STATUS.get(b["status"], 0), b["ts"]))
+        dados = json.dumps({"ts": agora, "status": resumo["status"], "msg": resumo["msg"],
+                            "workers": _BEATS}, ensure_ascii=False)
+        tmp = HEARTBEAT.with_name(f"{HEARTBEAT.name}.{os.getpid()}.tmp")
+        tmp.write_text(dados, encoding="utf-8")
+        try:
+            os.replace(tmp, HEARTBEAT)
+        except OSError:
+            # Windows: leitor com o arquivo aberto; o próximo beat regrava
+            log.debug("heartbeat.json ocupado; beat adiado", exc_info=True)
 
 
 # ─── Selenium helper ──────────────────────────────────────────────────
-def get_driver() -> webdriver.Chrome:
+def get_driver(profile: Path | None = None, download_dir: Path | None = None,
+               *, eventos: bool = False, rede: bool = False) -> webdriver.Chrome:
+    """
+    Abre um Chrome com perfil e pasta de download próprios.
+    Sem parâmetros usa settings.chrome_profile / settings.download_dir.
+    eventos=True liga o log de performance (eventos de download do DevTools).
+    rede=True inclui no log os eventos Network.* (captura do XHR de listagem).
+
+    settings.chrome_headless roda sem janela; settings.chrome_bloquear_recursos
+    desliga imagens e bloqueia (Network.setBlockedURLs) fontes e scripts de
+    analytics de `settings.chrome_bloqueios`. Downloads não são afetados.
+
+    Com settings.selenium_grid_url, o navegador roda num node do Grid
+    (webdriver.Remote): sem perfil persistente (login a cada navegador novo),
+    downloads gerenciados pelo Grid (ver utils/grid.py) e sem comandos CDP —
+    o bloqueio fica só nas imagens.
+    """
+    profile = profile or settings.chrome_profile
+    download_dir = download_dir or settings.download_dir
+    remoto = settings.selenium_grid_url
+
     opts = Options()
-    opts.add_argument(f"--user-data-dir={settings.chrome_profile}")
+    if not remoto:
+        opts.add_argument(f"--user-data-dir={profile}")
     opts.add_argument("--disable-gpu")
     opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-dev-shm-usage")
     opts.add_argument("--disable-popup-blocking")
     opts.add_argument("--safebrowsing-disable-download-protection")
+    if settings.chrome_headless:
+        opts.add_argument("--headless=new")
+        opts.add_argument("--window-size=1920,1080")
 
     chrome_prefs = {
         "download.prompt_for_download": False,
@@ -51,10 +109,31 @@ def get_driver() -> webdriver.Chrome:
         "profile.default_content_setting_values.automatic_downloads": 1,
 
     }
+    if not remoto:
+        chrome_prefs["download.default_directory"] = str(download_dir)
+    if settings.chrome_bloquear_recursos:
+        # imagens da página não são carregadas (anexos de imagem baixam normalmente)
+        chrome_prefs["profile.managed_default_content_settings.images"] = 2
     opts.add_experimental_option("prefs", chrome_prefs)
 
-    driver = webdriver.Chrome(options=opts)
-    driver.maximize_window()
+    if eventos or rede:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        opts.add_experimental_option("perfLoggingPrefs", {"enableNetwork": rede, "enablePage": eventos})
+
+    if remoto:
+        opts.enable_downloads = True        # se:downloadsEnabled
+        driver = webdriver.Remote(command_executor=remoto, options=opts)
+    else:
+        driver = webdriver.Chrome(options=opts)
+    if not settings.chrome_headless:
+        driver.maximize_window()
+    elif not remoto:
+        # headless ignora a pasta das prefs em alguns builds: fixa via CDP
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior",
+                               {"behavior": "allow", "downloadPath": str(download_dir)})
+    if settings.chrome_bloquear_recursos and settings.chrome_bloqueios and not remoto:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": settings.chrome_bloqueios})
     return driver
 
 
@@ -67,11 +146,7 @@ def abrir_os(driver: webdriver.Chrome, os_id: int) -> bool:
     try:
         # ── 1) ESPERA a primeira célula da grade mostrar o ID solicitado
         WebDriverWait(driver, 6).until(
-            lambda d: (
-                    d.find_element(By.CSS_SELECTOR,
-                                   "div[data-qe-id='col-identifier-row-0']")
-                    .text.strip() == str(os_id)
-            )
+            lambda d: scraping.texto(d, CSS["grid_linha0"]) == str(os_id)
         )
 
         # ── 2) SÓ AGORA clica no ícone de detalhes
@@ -95,33 +170,47 @@ def fechar_os(driver):
 
 
 def ultimo_id_portal(driver) -> int:
-    seletores = [
-        "div.wj-cell.wj-state-active[data-qe-id^='col-identifier-row']",
-        "tbody tr:first-child td:first-child",
-    ]
-    for css in seletores:
-        try:
-            el = WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, css))
-            )
-            if (texto := el.text.strip()).isdigit():
-                return int(texto)
-        except Exception:
-            continue
-    raise RuntimeError("Não achei ID no grid.")
+    """Maior ID (linha ativa do grid); espera até 15 s o grid carregar."""
+    try:
+        return WebDriverWait(driver, 15).until(scraping.topo_grid)
+    except Exception:
+        raise RuntimeError("Não achei ID no grid.")
 
 
 # ─── IDs visíveis no grid (máx n) ─────────────────────────────────────
 def lista_ids_portal(driver, n: int) -> list[int]:
-    seletores = [
-        "div.wj-cell[data-qe-id^='col-identifier-row']",
-        "tbody tr td:first-child"
-    ]
-    for sel in seletores:
-        els = driver.find_elements(By.CSS_SELECTOR, sel)
-        if els:
-            return [int(e.text.strip()) for e in els[:n] if e.text.strip().isdigit()]
-    return []
+    return scraping.ids_grid(driver, n)
+
+
+# ─── Listagem pelo XHR JSON do portal ─────────────────────────────────
+def recarregar_grid(driver):
+    """Pesquisa vazia: o SPA refaz a chamada de listagem do grid."""
+    campo = driver.find_element(By.CSS_SELECTOR, CSS["pesquisa"])
+    campo.clear()
+    campo.send_keys(Keys.ENTER)
+
+
+def listar_via_api(driver, ate_id: int | None) -> list[dict] | None:
+    """
+    OS do portal (mais novas primeiro) lidas do JSON que alimenta o grid,
+    paginando até alcançar `ate_id` (None → só a 1ª página).
+    Cada item: {"os_id", "apelido", "assunto", "anexos_total"}.
+    None se a captura falhar – o chamador volta a ler o grid.
+    """
+    try:
+        capturado = portal_api.capturar_listagem(
+            driver, settings.portal_api_padrao, lambda: recarregar_grid(driver))
+        if capturado is None:
+            return None
+        req, primeira = capturado
+        sessao = http_download.sessao_do_driver(driver, settings.http_paralelo)
+        itens = portal_api.listar(sessao, req, primeira, ate_id=ate_id,
+                                  max_paginas=settings.portal_api_max_paginas)
+    except Exception:
+        log.warning("Listagem via API falhou – usando o grid", exc_info=True)
+        return None
+    log.info("Listagem via API: %d OS", len(itens))
+    return sorted(itens, key=lambda i: i["os_id"], reverse=True)
 
 
 # ─── Semeadura (respeita banco) ───────────────────────────────────────
@@ -129,19 +218,28 @@ def semear_ids(driver):
     """
     • 1ª execução (DB vazio)  → grava até 10 IDs realmente visíveis.
     • Demais execuções        → grava apenas IDs > max_db.
+
+    Com settings.descoberta_modo == "api", IDs, apelidos, assuntos e
+    quantidade de anexos vêm da listagem JSON (uma requisição por página);
+    se a captura falhar, cai no grid.
     """
+    max_db = db.max_os_id()
+    first_seed_min = settings.first_seed_min_id
+
+    itens = None
+    if settings.descoberta_modo == "api":
+        itens = listar_via_api(driver, max_db if max_db is not None else first_seed_min)
+
     try:
-        topo = ultimo_id_portal(driver)          # maior ID visível agora
+        # maior ID visível agora
+        topo = itens[0]["os_id"] if itens else ultimo_id_portal(driver)
     except RuntimeError:
         beat("Grid não disponível ainda", status="idle")
         log.info("Grid não disponível; aguardando próximo ciclo")
         return
 
-    ids_exist = db.list_by_status(("pendente", "aguardando", "sucesso", "falha"))
-    first_seed_min = settings.first_seed_min_id
-
     # --- primeira execução ---------------------------------------------------
-    if not ids_exist:
+    if max_db is None:
         if first_seed_min:
             if topo < first_seed_min:
                 log.warning(
@@ -149,174 +247,708 @@ def semear_ids(driver):
                     "Nada para semear neste ciclo.", first_seed_min, topo)
                 return
             novos = range(first_seed_min, topo + 1)
+        elif itens:
+            novos = [i["os_id"] for i in itens[:N_INICIAL]]
         else:
             novos = lista_ids_portal(driver, N_INICIAL)
 
-        for os_id in novos:
-            db.upsert_os(os_id, status="pendente")
+        db.upsert_many(novos, status="pendente")
+        if itens:
+            db.atualizar_metadados(itens)
 
         log.info("Primeira execução: semeados IDs de %s a %s",
                  novos[0], novos[-1])
         return
 
     # --- execuções seguintes --------------------------------------------------
-    max_db = max(ids_exist)
     if topo > max_db:
         novos = range(max_db + 1, topo + 1)
-        for os_id in novos:
-            db.upsert_os(os_id, status="pendente")
+        db.upsert_many(novos, status="pendente")
         log.info("Novos IDs semeados (%d)", len(novos))
+    if itens:
+        db.atualizar_metadados(itens)
+
+
+# ─── Download direto via HTTP ─────────────────────────────────────────
+def baixar_anexos_http(driver, os_id: int, anexos: list[dict], indices: list[int],
+                       download_dir: Path) -> tuple[dict[int, Path], list[int]]:
+    """
+    Baixa por HTTP, em paralelo, os anexos `indices` cuja URL aparece nos
+    detalhes da OS (`anexos` = scraping.detalhes_os(...)["anexos"]),
+    reaproveitando os cookies da sessão Selenium.
+
+    Retorna ({índice: arquivo baixado}, índices que ainda precisam do clique):
+    anexos sem URL resolvida ou cujo download HTTP falhou.
+    """
+    com_url = [(i, anexos[i]["href"]) for i in indices if anexos[i]["href"]]
+    pendentes = [i for i in indices if not anexos[i]["href"]]
+
+    baixados = {}
+    if com_url:
+        sessao = http_download.sessao_do_driver(driver, settings.http_paralelo)
+        baixados, falhas = http_download.baixar_urls(
+            sessao, com_url, download_dir, settings.http_paralelo, settings.http_timeout)
+        pendentes += falhas
+
+    log.info("OS %s: %d anexos via HTTP, %d pelo clique", os_id, len(baixados), len(pendentes))
+    return baixados, sorted(pendentes)
+
+
+# ─── Estado por anexo (retomada) ──────────────────────────────────────
+def chave_anexo(anexos: list[dict], idx: int) -> str:
+    """Chave do anexo em os_anexos: id do elemento no portal (posição, se não houver)."""
+    return anexos[idx]["id"] or f"#{idx}"
+
+
+def anexo_integro(reg: dict | None, destino: Path) -> bool:
+    """True se o anexo registrado continua no destino com o mesmo tamanho e hash."""
+    if not reg:
+        return False
+    arq = destino / reg["nome"]
+    return (arq.is_file() and arq.stat().st_size == reg["tamanho"]
+            and blob_store.sha256_arquivo(arq) == reg["sha256"])
+
+
+def guardar_anexo(os_id: int, chave: str, arquivo: Path, destino: Path,
+                  ocupados: set[str]) -> dict:
+    """
+    Leva um anexo recém-baixado para a pasta destino da OS (blob + hardlink
+    quando o store está ligado) e registra nome/tamanho/hash em os_anexos.
+    Com settings.publicar_anexos, avisa o Cloud_2 na hora (anexos_queue).
+
+    `ocupados` = nomes já usados por outros anexos da OS no destino; um
+    homônimo recebe sufixo " (n)", como o Chrome faria.
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    nome, n = arquivo.name, 1
+    while nome in ocupados:
+        nome = f"{arquivo.stem} ({n}){arquivo.suffix}"
+        n += 1
+    final = destino / nome
+
+    if settings.blob_dir:
+        sha, blob = blob_store.guardar(arquivo, settings.blob_dir)
+        blob_store.vincular(blob, final)
+    else:
+        sha = blob_store.sha256_arquivo(arquivo)
+        shutil.move(arquivo, final)
+
+    reg = {"nome": nome, "tamanho": final.stat().st_size, "sha256": sha}
+    db.registrar_anexo(os_id, chave, **reg)
+    if settings.publicar_anexos:
+        message_queue.publish_anexo(os_id, str(final.resolve()), sha)
+    return reg
+
+
+class PossePerdida(Exception):
+    """A posse da OS venceu e outro worker a reivindicou (settings.distribuido)."""
+
+
+@dataclass
+class Tentativa:
+    """
+    Uma visita à OS: o que o navegador baixou (`baixados`, ainda na pasta de
+    download) e o que já está íntegro no destino (`prontos`).
+    """
+    os_id: int
+    apelido: str
+    detalhes: dict
+    pasta: Path                     # onde o Chrome / o HTTP gravam os arquivos
+    destino: Path                   # baixados/<os_id>-<apelido>
+    chaves: list[str]               # chave_anexo de cada anexo, na ordem do DOM
+    registrados: dict               # db.anexos_da_os(os_id)
+    prontos: set = field(default_factory=set)
+    baixados: dict = field(default_factory=dict)    # índice → arquivo
+    em_lotes: bool = False
+    ja_prontos: int = 0
+    perdida: threading.Event | None = None          # Lease.perdida (distribuído)
+
+    def conferir_posse(self):
+        """Interrompe a OS se a posse foi perdida: quem a reivindicou segue com ela."""
+        if self.perdida is not None and self.perdida.is_set():
+            raise PossePerdida(f"OS {self.os_id}: posse perdida")
+
+    def obtidos(self) -> int:
+        """Anexos já no destino + baixados nesta visita."""
+        return len(self.prontos | {self.chaves[i] for i in self.baixados})
+
+    def guardar_baixados(self):
+        """Leva os arquivos desta visita para o destino e os registra."""
+        for idx, arq in sorted(self.baixados.items()):
+            chave = self.chaves[idx]
+            ocupados = {r["nome"] for k, r in self.registrados.items() if k != chave}
+            self.registrados[chave] = guardar_anexo(self.os_id, chave, arq, self.destino, ocupados)
+            self.prontos.add(chave)
+        self.baixados.clear()
+
+
+def concluir_os(t: Tentativa):
+    """
+    Passos de disco e banco depois dos downloads: guarda os anexos no
+    destino, confere a quantidade, gera o TXT, copia para “separados”,
+    marca sucesso e publica na fila (ou registra o avanço da janela, em lotes).
+
+    Roda no próprio worker ou, com settings.pipeline, no finalizador.
+    """
+    t.conferir_posse()
+    t.guardar_baixados()
+    qtd_anexos = len(t.chaves)
+
+    # Janela concluída com avanço: volta depois para a próxima
+    if t.em_lotes and t.ja_prontos < len(t.prontos) < qtd_anexos:
+        t.conferir_posse()
+        db.mark_status(t.os_id, "em_lotes", extra={"apelido": t.apelido, "anexos_total": qtd_anexos})
+        log.info("OS %s: janela concluída – %d/%d anexos", t.os_id, len(t.prontos), qtd_anexos)
+        return
+
+    # 4. Confere quantidade (o que já foi para o destino fica; a próxima
+    #    tentativa baixa só o que falta)
+    if len(t.prontos) != qtd_anexos:
+        raise Exception("Quant. baixada ({}) ≠ esperada ({})".format(len(t.prontos), qtd_anexos))
+
+    # 5. Pasta destino já reúne todos os anexos
+    t.destino.mkdir(parents=True, exist_ok=True)
+
+    # 6. Gera TXT com assunto e descrição (já lidos no passo 1)
+    assunto = t.detalhes["assunto"] or ""
+    descricao = t.detalhes["descricao"] or ""
+    with open(t.destino / "!!!ABRA_MENSAGEM_DO_CLIENTE!!!.txt", "w", encoding="utf-8") as f:
+        f.write(f"Assunto: {assunto}\nDetalhe: {descricao}")
+
+    # 7. Cópia para pasta “separados” (hardlinks quando o store está ligado)
+    destino_sep = settings.separados_dir / t.destino.name
+    if destino_sep.exists():
+        shutil.rmtree(destino_sep)
+    copia = blob_store.vincular if settings.blob_dir else shutil.copy2
+    shutil.copytree(t.destino, destino_sep, copy_function=copia)
+
+    # 8. Atualiza status + fila
+    t.conferir_posse()
+    db.mark_status(t.os_id, "sucesso", extra=dict(
+        apelido=t.apelido, assunto=assunto, descricao=descricao,
+        anexos_total=qtd_anexos))
+    message_queue.publish(t.os_id)
+
+
+def concluir_em_segundo_plano(t: Tentativa):
+    """Tarefa do finalizador: conclui a OS e descarta a pasta própria dela."""
+    try:
+        concluir_os(t)
+    except PossePerdida:
+        log.warning("OS %s abandonada: posse perdida antes da conclusão", t.os_id)
+    except Exception as exc:
+        log.error("Erro ao concluir a OS %s", t.os_id, exc_info=True)
+        db.mark_status(t.os_id, "falha", inc_try=True,
+                       extra={"apelido": t.apelido, "motivo": str(exc)})
+        reagendar(t.os_id)
+    finally:
+        shutil.rmtree(t.pasta, ignore_errors=True)
 
 
 # ─── Rotina de download ───────────────────────────────────────────────
-def baixar_anexos(driver, os_id: int):
+def baixar_anexos(driver, os_id: int, download_dir: Path | None = None,
+                  finalizador: Finalizador | None = None,
+                  perdida: threading.Event | None = None):
+    """
+    Uma tentativa de baixar a OS.
+
+    Com `finalizador` (settings.pipeline), os anexos vão para uma pasta só da
+    OS (<download_dir>/os_<id>) e os passos de disco/banco (`concluir_os`)
+    seguem em segundo plano, liberando o navegador para a próxima OS.
+
+    Num node do Selenium Grid, cada clique é esperado no node e o arquivo
+    trazido para a pasta local (utils/grid.py); o resto do fluxo é o mesmo.
+
+    Com `perdida` (Lease.perdida, settings.distribuido), a OS é abandonada
+    sem gravar status assim que a posse é perdida (conferido entre anexos).
+    """
+    download_dir = download_dir or settings.download_dir
+    pasta_os = download_dir / f"os_{os_id}" if finalizador else download_dir
+    remoto = bool(settings.selenium_grid_url)
+
     # 0. Limpa pasta de download antes de começar
-    for f in settings.download_dir.iterdir():
+    for f in download_dir.iterdir():
         if f.is_file():
             f.unlink()
+    if remoto:
+        grid.limpar_node(driver)
+
+    # 0.1 Pré-filtro: quantidade de anexos já conhecida pela listagem da API
+    reg = db.get_os(os_id)
+    if not settings.lotes and reg and (reg["anexos_total"] or 0) > LIMITE_ANEXOS:
+        db.mark_status(os_id, "falha", inc_try=False, extra={"motivo": MOTIVO_EXCESSO})
+        log.warning("OS %s: %d anexos pela listagem – excede o limite, pulando sem abrir.",
+                    os_id, reg["anexos_total"])
+        return
 
-    # 0.1 Tenta abrir OS
+    # 0.2 Tenta abrir OS
     if not abrir_os(driver, os_id):
         db.mark_status(os_id, "aguardando", inc_try=True)
         return
 
     apelido = None
+    t = None
+    entregue = False
     try:
-        apelido = driver.find_element(By.CSS_SELECTOR, CSS["apelido"]).text.strip()
+        # 1. Lê apelido, assunto, descrição e anexos numa única ida ao navegador
+        detalhes = scraping.detalhes_os(driver)
+        apelido = detalhes["apelido"]
+        if not apelido:
+            raise RuntimeError("Detalhes da OS sem apelido")
         beat(f"baixando {os_id}-{apelido}", status="running")
 
-        # 1. Conta anexos
-        anexos = driver.find_elements(By.CSS_SELECTOR, CSS["anexos"])
+        anexos = detalhes["anexos"]
         qtd_anexos = len(anexos)
         log.info("OS %s: %d anexos detectados", os_id, qtd_anexos)
 
-        # 1.1 Limite de anexos
-        if qtd_anexos > LIMITE_ANEXOS:
+        # 1.1 Limite de anexos (com settings.lotes, a OS segue em janelas)
+        em_lotes = qtd_anexos > LIMITE_ANEXOS
+        if em_lotes and not settings.lotes:
             db.mark_status(os_id, "falha", inc_try=False,
                            extra={"apelido": apelido, "motivo": MOTIVO_EXCESSO})  # NEW
             fechar_os(driver)
             log.warning("OS %s excedeu limite, pulando.", os_id)
             return
 
-        resultados = []
-
-        # 2. Download de cada anexo  (re-localiza o elemento a cada volta)  # NEW
-        for idx in range(1, qtd_anexos + 1):
-            elm = driver.find_elements(By.CSS_SELECTOR, CSS["anexos"])[idx - 1]
-            antes = {p.name for p in settings.download_dir.iterdir()}
-            driver.execute_script("arguments[0].click()", elm)
-            novos = espera_download(settings.download_dir, antes, post_delay=2)
-            log.info("OS %s: anexo %d/%d baixado: %s", os_id, idx, qtd_anexos, novos)
-            resultados += novos
+        # 1.2 Retomada: anexos íntegros de tentativas anteriores já estão no
+        #     destino e não são baixados de novo
+        t = Tentativa(
+            os_id=os_id, apelido=apelido, detalhes=detalhes, pasta=pasta_os,
+            destino=settings.baixados_dir / f"{os_id}-{apelido}",
+            chaves=[chave_anexo(anexos, i) for i in range(qtd_anexos)],
+            registrados=db.anexos_da_os(os_id), em_lotes=em_lotes, perdida=perdida)
+        t.prontos = {k for k in t.chaves if anexo_integro(t.registrados.get(k), t.destino)}
+        t.ja_prontos = len(t.prontos)
+        pendentes = [i for i, k in enumerate(t.chaves) if k not in t.prontos]
+        if t.prontos:
+            log.info("OS %s: %d/%d anexos já baixados antes – faltam %d",
+                     os_id, len(t.prontos), qtd_anexos, len(pendentes))
+
+        # 1.2.1 Lotes: OS grande baixa no máximo `lote_tamanho` anexos por visita
+        #       (e por no máximo `lote_orcamento_s`); o resto fica para a próxima janela
+        inicio = time.monotonic()
+        if em_lotes:
+            pendentes = pendentes[:settings.lote_tamanho]
+            log.info("OS %s em lotes: janela de %d anexos (%d/%d prontos)",
+                     os_id, len(pendentes), t.ja_prontos, qtd_anexos)
+
+        # 1.2.2 Pipeline: o Chrome grava na pasta própria desta OS
+        if finalizador:
+            shutil.rmtree(pasta_os, ignore_errors=True)
+            pasta_os.mkdir(parents=True)
+            if not remoto:
+                driver.execute_cdp_cmd("Browser.setDownloadBehavior",
+                                       {"behavior": "allow", "downloadPath": str(pasta_os)})
+
+        def obtido(idx: int, arquivo: Path):
+            # sem pipeline, cada anexo vai já para o destino (e para a fila de
+            # anexos); com pipeline, o finalizador guarda todos no fim
+            t.baixados[idx] = arquivo
+            if not finalizador:
+                t.guardar_baixados()
+
+        # 1.3 Modo HTTP: baixa direto o que tiver URL; o resto cai no clique
+        if settings.download_modo == "http" and pendentes:
+            baixados, pendentes = baixar_anexos_http(driver, os_id, anexos, pendentes, pasta_os)
+            for idx, arq in baixados.items():
+                obtido(idx, arq)
+
+        # 1.4 Eventos do DevTools: cada anexo resolve assim que o Chrome o finaliza
+        monitor = None
+        if settings.download_eventos and pendentes and not remoto:
+            monitor = MonitorDownloads(driver, pasta_os)
+            if not monitor.ativar():
+                monitor = None
+        todos_por_evento = monitor is not None
+
+        # 2. Download de cada anexo (clique por posição via JS, sem re-localizar)
+        for idx in pendentes:
+            t.conferir_posse()
+            if em_lotes and time.monotonic() - inicio > settings.lote_orcamento_s:
+                log.info("OS %s: orçamento da janela esgotado", os_id)
+                break
+            antes = {p.name for p in pasta_os.iterdir()}
+            antes_node = grid.arquivos_no_node(driver) if remoto else set()
+            if monitor and monitor.ativo:
+                monitor.marcar()
+            if not scraping.clicar_anexo(driver, idx):
+                raise RuntimeError(f"Anexo {idx + 1} sumiu da tela de detalhes")
+
+            concluido = monitor.espera(600, antes) if monitor and monitor.ativo else None
+            if concluido:
+                novos = [concluido.caminho]
+                log.info("OS %s: anexo %d/%d baixado: %s (%d bytes, %.1fs)", os_id, idx + 1,
+                         qtd_anexos, concluido.caminho.name, concluido.tamanho, concluido.segundos)
+            else:
+                todos_por_evento = False
+                novos = (grid.espera_download_node(driver, pasta_os, antes_node) if remoto
+                         else espera_download(pasta_os, antes, post_delay=2))
+                log.info("OS %s: anexo %d/%d baixado: %s", os_id, idx + 1, qtd_anexos, novos)
+            if len(novos) == 1:
+                obtido(idx, novos[0])
+            # mais de um arquivo novo: dono incerto, resolvido no passo 3.1
 
         # 3. Espera terminar (.crdownload ou .tmp)                       # NEW
+        #    (desnecessário quando todos os anexos foram confirmados por evento)
         max_wait = max(200, qtd_anexos * 10)      # timeout proporcional  # NEW
         waited = 0
-        while any(f.suffix in (".crdownload", ".tmp") for f in settings.download_dir.iterdir()):
+        while not todos_por_evento and any(
+                f.suffix in (".crdownload", ".tmp") for f in pasta_os.iterdir()):
             time.sleep(1)
             waited += 1
             if waited > max_wait:
                 raise Exception("Timeout > {} s esperando downloads".format(max_wait))
 
-        # 4. Confere quantidade
-        arquivos_baixados = [f for f in settings.download_dir.iterdir()
-                             if f.is_file() and f.suffix not in (".crdownload", ".tmp")]
-        if len(arquivos_baixados) != qtd_anexos:
-            db.mark_status(os_id, "falha", inc_try=True, extra={"apelido": apelido})
-            raise Exception("Quant. baixada ({}) ≠ esperada ({})".format(
-                len(arquivos_baixados), qtd_anexos))
-
-        # 5. Move para pasta destino
-        pasta = f"{os_id}-{apelido}"
-        destino = settings.baixados_dir / pasta
-        mover_arquivos(arquivos_baixados, destino)
-
-        # 6. Gera TXT com assunto e descrição
-        assunto = driver.find_element(By.CSS_SELECTOR, CSS["assunto"]).text.strip()
-        descricao = driver.find_element(By.CSS_SELECTOR, CSS["descricao"]).text.strip()
-        with open(destino / "!!!ABRA_MENSAGEM_DO_CLIENTE!!!.txt", "w", encoding="utf-8") as f:
-            f.write(f"Assunto: {assunto}\nDetalhe: {descricao}")
-
-        # 7. Cópia para pasta “separados”
-        destino_sep = settings.separados_dir / pasta
-        if destino_sep.exists():
-            shutil.rmtree(destino_sep)
-        shutil.copytree(destino, destino_sep)
-
-        # 8. Atualiza status + fila
-        db.mark_status(os_id, "sucesso", extra=dict(
-            apelido=apelido, assunto=assunto, descricao=descricao,
-            anexos_total=len(arquivos_baixados)))
-        message_queue.publish(os_id)
+        # 3.1 Arquivos que sobraram na pasta: casa com os anexos que faltam
+        #     pelo nome exibido no portal (ou direto, se só falta um)
+        usados = set(t.baixados.values())
+        soltos = [f for f in pasta_os.iterdir()
+                  if f.is_file() and f.suffix not in (".crdownload", ".tmp") and f not in usados]
+        faltam = [i for i, k in enumerate(t.chaves) if k not in t.prontos and i not in t.baixados]
+        for arq in soltos:
+            idx = next((i for i in faltam if anexos[i]["nome"] == arq.name), None)
+            if idx is None and len(faltam) == 1 and len(soltos) == 1:
+                idx = faltam[0]
+            if idx is not None:
+                obtido(idx, arq)
+                faltam.remove(idx)
+
+        # 4-8. Guarda, confere, TXT, “separados”, status e fila
+        if finalizador:
+            finalizador.enviar(concluir_em_segundo_plano, t)
+            entregue = True
+        else:
+            concluir_os(t)
+
+    except PossePerdida:
+        log.warning("OS %s abandonada: posse perdida para outro worker", os_id)
 
     except Exception as exc:
+        if t is not None and t.baixados and not entregue:
+            try:
+                t.guardar_baixados()      # o que chegou fica para a retomada
+            except Exception:
+                log.warning("OS %s: falha ao guardar anexos parciais", os_id, exc_info=True)
+        if isinstance(exc, ERROS_SESSAO):
+            raise       # navegador perdido: processar_os troca, sem contar tentativa
         log.error("Erro na OS %s", os_id, exc_info=True)
         extra = {"apelido": apelido, "motivo": str(exc)} if apelido else {"motivo": str(exc)}
         db.mark_status(os_id, "falha", inc_try=True, extra=extra)
 
     finally:
         fechar_os(driver)
-        # Limpa o download_dir pós-processamento
-        for f in settings.download_dir.iterdir():
+        # Limpa o download_dir pós-processamento (a pasta da OS entregue ao
+        # finalizador é removida por ele)
+        for f in download_dir.iterdir():
             if f.is_file():
                 f.unlink()
+        if finalizador and not entregue:
+            shutil.rmtree(pasta_os, ignore_errors=True)
+
+
+# ─── Store de blobs ───────────────────────────────────────────────────
+_ultima_poda = 0.0
+
+
+def podar_blobs():
+    """
+    A cada `blob_poda_intervalo_s`, remove do store os blobs cujas cópias em
+    baixados/separados (e nas pastas de clientes) já foram apagadas.
+    """
+    global _ultima_poda
+    if not settings.blob_dir or not settings.blob_poda_intervalo_s:
+        return
+    if time.monotonic() - _ultima_poda < settings.blob_poda_intervalo_s and _ultima_poda:
+        return
+    _ultima_poda = time.monotonic()
+    try:
+        blob_store.podar(settings.blob_dir, settings.blob_poda_idade_s)
+    except Exception:
+        log.warning("Falha ao podar o store de blobs", exc_info=True)
 
 
 # ─── Resiliência (buracos apenas min_db..max_db) ──────────────────────
 def reenfileirar_lacunas():
-    todos = db.list_by_status(("pendente", "sucesso", "falha", "aguardando"))
-    if not todos:
+    inseridos = db.preencher_lacunas(status="pendente")
+    if inseridos:
+        log.info("Lacunas detectadas → %d reinseridos", inseridos)
+
+
+# ─── Agendamento de retentativas ──────────────────────────────────────
+def reagendar(os_id: int):
+    """
+    Após uma tentativa, agenda a próxima conforme a política de backoff do
+    motivo da falha (utils/backoff.py). Sucesso/pendente não são tocados.
+    """
+    reg = db.get_os(os_id)
+    if not reg or reg["status"] not in ("aguardando", "falha"):
         return
-    min_id, max_id = min(todos), max(todos)
-    faltantes = set(range(min_id, max_id + 1)) - set(todos)
-    for os_id in faltantes:
-        db.upsert_os(os_id, status="pendente")
-    if faltantes:
-        log.info("Lacunas detectadas → %d reinseridos", len(faltantes))
+    atraso = backoff.proximo_intervalo(reg["status"], reg["motivo"], reg["tentativas"])
+    quando = None if atraso is None else int(time.time() + atraso)
+    db.agendar(os_id, quando)
+    if quando is None:
+        log.info("OS %s: sem nova tentativa automática (%s)", os_id, reg["motivo"])
+    else:
+        log.info("OS %s: nova tentativa em %.0f s (%s, tentativa %d)",
+                 os_id, atraso, reg["status"], reg["tentativas"])
+
+
+# ─── Pool de navegadores ──────────────────────────────────────────────
+def pastas_worker(worker: int, total: int) -> tuple[Path, Path]:
+    """
+    Perfil Chrome e pasta de download exclusivos do worker.
+
+    • total == 1 → mantém settings.chrome_profile / settings.download_dir
+    • total > 1  → pastas irmãs com sufixo "_w<N>" (ex.: .chrome_profile_w2),
+      para que cada navegador tenha sessão e downloads isolados.
+    • settings.distribuido → sufixo "_<worker_id>" antes, para que processos
+      na mesma máquina não dividam pastas. O worker_id é estável (hostname
+      ou WORKER_ID): o perfil — e o login salvo — sobrevivem a reinícios.
+    """
+    sufixo = f"_{settings.worker_id}" if settings.distribuido else ""
+    if total > 1:
+        sufixo += f"_w{worker}"
+    if not sufixo:
+        return settings.chrome_profile, settings.download_dir
+
+    profile = settings.chrome_profile.with_name(f"{settings.chrome_profile.name}{sufixo}")
+    download_dir = settings.download_dir.with_name(f"{settings.download_dir.name}{sufixo}")
+    for p in (profile, download_dir):
+        p.mkdir(parents=True, exist_ok=True)
+    return profile, download_dir
+
+
+def gerente_worker(worker: int, total: int) -> GerenciadorDriver:
+    """
+    Gerenciador do navegador persistente do worker. Com settings.driver_reserva,
+    usa um segundo perfil (sufixo "_reserva") para o Chrome de reserva.
+    """
+    profile, download_dir = pastas_worker(worker, total)
+    perfis = [profile]
+    if settings.driver_reserva:
+        perfis.append(profile.with_name(f"{profile.name}_reserva"))
+
+    return GerenciadorDriver(
+        fabrica=lambda perfil: get_driver(perfil, download_dir, eventos=settings.download_eventos,
+                                          rede=settings.descoberta_modo == "api"),
+        login=do_login,
+        perfis=perfis,
+        max_os=settings.driver_max_os,
+        max_memoria_mb=settings.driver_max_memoria_mb,
+    )
 
 
 # ─── Loop principal ───────────────────────────────────────────────────
-def loop_download():
-    with get_driver() as driver:
-        do_login(driver)
+def processar_os(gerente: GerenciadorDriver, os_id: int, download_dir: Path,
+                 finalizador: Finalizador | None = None,
+                 perdida: threading.Event | None = None):
+    """Uma tentativa (ou uma janela, em lotes) de uma OS + reagendamento."""
+    driver = gerente.obter()
+    try:
+        baixar_anexos(driver, os_id, download_dir, finalizador, perdida)
+    except ERROS_SESSAO as exc:
+        log.warning("Navegador perdido na OS %s (%s) – trocando navegador",
+                    os_id, type(exc).__name__)
+        gerente.trocar()
+        return
+    if perdida is None or not perdida.is_set():
+        reagendar(os_id)        # posse perdida: o agendamento é do novo dono
+    gerente.registrar_os()
+    if finalizador is None:
+        time.sleep(2)
+
+
+def loop_download(gerente: GerenciadorDriver, worker: int = 0, total: int = 1,
+                  finalizador: Finalizador | None = None):
+    """
+    Um ciclo completo de um worker, sobre o navegador já aberto do `gerente`.
+
+    Só o worker 0 semeia IDs e preenche lacunas (e, com settings.distribuido,
+    só nos processos com settings.semeador); a fila (pendentes primeiro,
+    depois retentativas vencidas, por fim janelas de OS em lotes) é fatiada
+    por `os_id % total`, de modo que dois workers nunca peguem a mesma OS.
+    Com settings.distribuido a fatia dá lugar à posse por OS (`loop_distribuido`).
+
+    Com `finalizador`, a conclusão de cada OS corre em paralelo com a abertura
+    da seguinte; ao fim de cada volta da fila espera-se o finalizador esvaziar.
+
+    Retorna quantas OS (ou janelas) foram processadas.
+    """
+    _, download_dir = pastas_worker(worker, total)
+    shard = (total, worker) if total > 1 and not settings.distribuido else None
+
+    driver = gerente.obter()
+    if worker == 0 and settings.semeador:
         semear_ids(driver)
         reenfileirar_lacunas()
+        podar_blobs()
+
+    if settings.distribuido:
+        return loop_distribuido(gerente, worker, download_dir, finalizador)
+
+    # OS grandes em lotes: enquanto as janelas avançarem, a fila é refeita;
+    # a cada volta, o que venceu na fila normal passa na frente da próxima janela
+    progresso = None
+    processadas = 0
+    while True:
+        for os_id in db.list_due(settings.max_attempts, shard=shard):
+            processar_os(gerente, os_id, download_dir, finalizador)
+            processadas += 1
+        if finalizador:
+            finalizador.aguardar()
+
+        lotes = db.list_by_status(("em_lotes",), shard=shard)
+        feitos = db.contar_anexos(lotes)
+        if not lotes or feitos == progresso:
+            return processadas
+        progresso = feitos
 
-        for os_id in db.list_by_status(("pendente",)):
-            baixar_anexos(driver, os_id)
-            time.sleep(2)
 
-        for os_id in db.list_for_retry("aguardando", settings.max_attempts, COOLDOWN_MIN):
-            baixar_anexos(driver, os_id)
-            time.sleep(2)
+def loop_distribuido(gerente: GerenciadorDriver, worker: int, download_dir: Path,
+                     finalizador: Finalizador | None = None) -> int:
+    """
+    Fila do ciclo com posse por OS, para vários processos (em hosts
+    diferentes ou não) sobre o mesmo banco: cada OS é reivindicada
+    (db.reivindicar) e a posse é renovada por heartbeat enquanto é baixada.
+    A posse de um worker que caiu vence em `lease_s` e a OS volta à fila.
+
+    Com `finalizador`, a posse só é devolvida depois da conclusão em segundo
+    plano. O ciclo termina quando não há OS livre ou quando a próxima já foi
+    visitada nesta volta (ex.: janela seguinte de uma OS em lotes).
+    """
+    dono = f"{settings.worker_id}-{os.getpid()}/w{worker}"
+    visitadas: set[int] = set()
+    while True:
+        os_id = db.reivindicar(dono, settings.lease_s, settings.max_attempts)
+        if os_id is None:
+            break
+        lease = Lease(
+            os_id,
+            renovar=lambda os_id=os_id: db.renovar_lease(os_id, dono, settings.lease_s),
+            devolver=lambda os_id=os_id: db.liberar_lease(os_id, dono),
+            heartbeat_s=settings.lease_heartbeat_s,
+            ao_encerrar=db.fechar,
+        ).iniciar()
+        if os_id in visitadas:
+            lease.liberar()
+            break
+        visitadas.add(os_id)
+        try:
+            processar_os(gerente, os_id, download_dir, finalizador, lease.perdida)
+        finally:
+            if finalizador:
+                finalizador.enviar(lease.liberar)
+            else:
+                lease.liberar()
 
-        for os_id in db.list_for_retry("falha", settings.max_attempts, COOLDOWN_MIN):
-            motivo = db.get_motivo(os_id)
-            if motivo and MOTIVO_EXCESSO in motivo.lower():
-                continue
-            baixar_anexos(driver, os_id)
-            time.sleep(2)
+    if finalizador:
+        finalizador.aguardar()
+    return len(visitadas)
+
+
+def sondar(gerente: GerenciadorDriver, worker: int, total: int) -> bool:
+    """
+    Sonda leve entre ciclos: True se vale rodar o ciclo completo.
+
+    • há OS devida no banco (pendente, retentativa vencida, lote) → True
+    • worker 0: recarrega o grid no navegador já logado e compara o ID do
+      topo com o maior do banco (sem login, semeadura nem varredura)
+    """
+    shard = (total, worker) if total > 1 and not settings.distribuido else None
+    if db.tem_devidas(settings.max_attempts, shard=shard):
+        return True
+    if worker != 0 or not settings.semeador:
+        return False
+
+    driver = gerente.obter()
+    antes = scraping.topo_grid(driver)
+    recarregar_grid(driver)
+    try:
+        # espera o grid trocar de conteúdo; sem mudança, fica o topo atual
+        WebDriverWait(driver, 5).until(lambda d: scraping.topo_grid(d) not in (None, antes))
+    except Exception:
+        pass
+    topo = scraping.topo_grid(driver)
+    max_db = db.max_os_id()
+    return topo is not None and (max_db is None or topo > max_db)
+
+
+def dormir(segundos: float):
+    """Espera entre ciclos, mantendo o heartbeat a cada 30 s."""
+    interval = 30
+    slept = 0
+    while slept < segundos:
+        time.sleep(min(interval, segundos - slept))
+        slept += interval
+        beat("Aguardando novas solicitações", status="idle")
+
+
+def executar_worker(worker: int = 0, total: int = 1):
+    """
+    Laço infinito de um worker: ciclo de download + espera entre ciclos.
+    O navegador (logado) sobrevive entre ciclos; só é trocado se travar ou
+    atingir os limites de reciclagem.
+
+    Com settings.cadencia_adaptativa, entre ciclos roda só a `sondar`, num
+    intervalo que encurta após atividade / no expediente e se alonga com o
+    portal parado; o ciclo completo só roda quando a sonda acha trabalho
+    (ou a cada `ciclo_completo_max_s`, por garantia).
+    """
+    gerente = gerente_worker(worker, total)
+    finalizador = (Finalizador(f"finalizador-{worker}", ao_encerrar=db.fechar)
+                   if settings.pipeline else None)
+    cadencia = Cadencia(settings.cadencia_min_s, settings.cadencia_max_s,
+                        settings.cadencia_max_expediente_s,
+                        settings.expediente_inicio, settings.expediente_fim)
+    ultimo_ciclo = None
+    try:
+        while True:
+            beat("Aguardando novas solicitações", status="idle")
+            try:
+                processadas = 0
+                completo = (not settings.cadencia_adaptativa
+                            or ultimo_ciclo is None
+                            or time.monotonic() - ultimo_ciclo > settings.ciclo_completo_max_s
+                            or sondar(gerente, worker, total))
+                if completo:
+                    processadas = loop_download(gerente, worker, total, finalizador)
+                    ultimo_ciclo = time.monotonic()
+                if processadas:
+                    cadencia.atividade()
+                else:
+                    cadencia.ocioso()
+            except Exception as e:
+                log.exception("Falha inesperada no loop (worker %d)", worker)
+                user_msg = formatar_erro_usuario(e)
+                beat(f"Erro: {user_msg}", status="error")
+
+            dormir(cadencia.intervalo() if settings.cadencia_adaptativa else settings.sleep_seconds)
+    finally:
+        if finalizador:
+            finalizador.encerrar()
+        gerente.encerrar()
+        db.fechar()
 
 
 # ─── Main ─────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     db.init_db()
+    if settings.lotes:
+        reabertas = db.reabrir_excesso_anexos(MOTIVO_EXCESSO)
+        if reabertas:
+            log.info("Lotes: %d OS com excesso de anexos devolvidas à fila", reabertas)
     log.info("Bot iniciado – first_seed_min_id=%s", settings.first_seed_min_id)
-    log.info("Bot de download iniciado")
-
-    while True:
-        beat("Aguardando novas solicitações", status="idle")
-        try:
-            loop_download()
-        except Exception as e:
-            log.exception("Falha inesperada no loop")
-            user_msg = formatar_erro_usuario(e)
-            beat(f"Erro: {user_msg}", status="error")
-
-        total_sleep = settings.sleep_seconds
-        interval = 30
-        slept = 0
-        while slept < total_sleep:
-            time.sleep(min(interval, total_sleep - slept))
-            slept += interval
-            beat("Aguardando novas solicitações", status="idle")
+    log.info("Bot de download iniciado – %d worker(s)", settings.n_workers)
+
+    if settings.n_workers > 1:
+        threads = [
+            threading.Thread(target=executar_worker, args=(i, settings.n_workers),
+                             name=f"worker-{i}", daemon=True)
+            for i in range(settings.n_workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    else:
+        executar_worker()
@@ -0,0 +1,230 @@
+"""
+Benchmark do Cloud_1 contra o portal simulado (simulador/portal.py).
+
+Sobe o portal na própria máquina, aponta o bot para ele (banco, fila, pastas
+e perfil do Chrome numa pasta temporária) e roda o ciclo real de
+`scripts/download.py` até todas as OS terminarem ou o tempo acabar.
+
+Qualquer configuração do bot vale: basta exportar as variáveis de sempre.
+
+    cd Cloud_1
+    DOWNLOAD_MODO=http PIPELINE=true CHROME_HEADLESS=true \\
+        python -m simulador.benchmark --os 40 --workers 2
+
+O portal é configurado pelas variáveis SIM_* (ver ConfigSimulador), ex.:
+SIM_LATENCIA_MS=400 SIM_FALHA_INDISPONIVEL=0.1 SIM_BANDA_KBPS=2048.
+
+Relatório: OS/hora, latência por etapa (n, média, p50, p95) e, para as OS
+que falharam alguma vez, o tempo da primeira falha até o sucesso.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import uvicorn
+
+from simulador.portal import CAMINHO_PORTAL, ConfigSimulador, criar_app
+
+
+class Medidor:
+    """Durações por etapa e linha do tempo de falhas/sucessos por OS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas: dict[str, list[float]] = defaultdict(list)
+        self.primeira_falha: dict[int, float] = {}
+        self.sucesso: dict[int, float] = {}
+
+    def cronometrar(self, nome: str, funcao):
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.etapas[nome].append(time.perf_counter() - inicio)
+        return medida
+
+    def status(self, os_id: int, status: str):
+        agora = time.monotonic()
+        with self._lock:
+            if status in ("aguardando", "falha"):
+                self.primeira_falha.setdefault(os_id, agora)
+            elif status == "sucesso":
+                self.sucesso.setdefault(os_id, agora)
+
+
+def _ambiente(pasta: Path, porta: int, config: ConfigSimulador):
+    """Isola o bot na pasta temporária; variáveis já exportadas prevalecem."""
+    padrao = {
+        "ONVIO_USER": "simulador",
+        "ONVIO_PASS": "simulador",
+        "ROOT_DIR": str(pasta),                  # fila (queue.db) e logs
+        "DB_PATH": str(pasta / "os_status.db"),
+        "CHROME_PROFILE": str(pasta / "chrome_profile"),
+        "DOWNLOAD_DIR": str(pasta / "download"),
+        "BAIXADOS_DIR": str(pasta / "baixados"),
+        "SEPARADOS_DIR": str(pasta / "separados"),
+        "FIRST_SEED_MIN_ID": str(config.id_inicial),
+    }
+    for chave, valor in padrao.items():
+        os.environ.setdefault(chave, valor)
+    os.environ["PORTAL_URL"] = f"http://127.0.0.1:{porta}{CAMINHO_PORTAL}"
+
+
+def _subir_portal(app, porta: int) -> uvicorn.Server:
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+    threading.Thread(target=servidor.run, name="portal-simulado", daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def _relatorio(medidor: Medidor, total: int, segundos: float, portal, settings) -> dict:
+    recuperacoes = [medidor.sucesso[i] - t for i, t in medidor.primeira_falha.items()
+                    if i in medidor.sucesso]
+    return {
+        "configuracao": {
+            "n_workers": settings.n_workers,
+            "download_modo": settings.download_modo,
+            "download_eventos": settings.download_eventos,
+            "pipeline": settings.pipeline,
+            "chrome_headless": settings.chrome_headless,
+            "chrome_bloquear_recursos": settings.chrome_bloquear_recursos,
+            "descoberta_modo": settings.descoberta_modo,
+            "selenium_grid_url": settings.selenium_grid_url,
+        },
+        "os_total": total,
+        "os_sucesso": len(medidor.sucesso),
+        "duracao_s": round(segundos, 1),
+        "os_por_hora": round(len(medidor.sucesso) / segundos * 3600, 1) if segundos else 0.0,
+        "etapas_ms": {
+            nome: {
+                "n": len(v),
+                "media": round(statistics.fmean(v) * 1000, 1),
+                "p50": round(_percentil(v, 0.50) * 1000, 1),
+                "p95": round(_percentil(v, 0.95) * 1000, 1),
+            }
+            for nome, v in sorted(medidor.etapas.items())
+        },
+        "recuperacao": {
+            "os_com_falha": len(medidor.primeira_falha),
+            "recuperadas": len(recuperacoes),
+            "media_s": round(statistics.fmean(recuperacoes), 1) if recuperacoes else None,
+            "max_s": round(max(recuperacoes), 1) if recuperacoes else None,
+        },
+        "portal": {"topo": portal.topo(), **portal.contadores},
+    }
+
+
+def _imprimir(r: dict):
+    print("\n=== Benchmark Cloud_1 (portal simulado) ===")
+    for k, v in r["configuracao"].items():
+        print(f"  {k:<26} {v}")
+    print(f"\n  OS concluídas   {r['os_sucesso']}/{r['os_total']} em {r['duracao_s']} s")
+    print(f"  Vazão           {r['os_por_hora']} OS/hora\n")
+    print(f"  {'etapa':<22}{'n':>6}{'média ms':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for nome, e in r["etapas_ms"].items():
+        print(f"  {nome:<22}{e['n']:>6}{e['media']:>12}{e['p50']:>10}{e['p95']:>10}")
+    rec = r["recuperacao"]
+    print(f"\n  OS com falha    {rec['os_com_falha']} (recuperadas: {rec['recuperadas']}, "
+          f"média {rec['media_s']} s, máx {rec['max_s']} s)")
+    print(f"  Portal          {r['portal']}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--os", type=int, default=20, help="OS publicadas no portal (padrão 20)")
+    parser.add_argument("--workers", type=int, default=None, help="navegadores (padrão N_WORKERS)")
+    parser.add_argument("--limite", type=int, default=1800, help="tempo máximo em segundos")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--pasta", type=Path, default=None, help="pasta de trabalho (padrão: temporária)")
+    parser.add_argument("--json", type=Path, default=None, help="grava o relatório em JSON")
+    args = parser.parse_args()
+
+    os.environ["SIM_TOTAL_OS"] = str(args.os)
+    if args.workers:
+        os.environ["N_WORKERS"] = str(args.workers)
+    config = ConfigSimulador()
+    pasta = args.pasta or Path(tempfile.mkdtemp(prefix="bench_cloud1_"))
+    _ambiente(pasta, args.porta, config)
+
+    # só agora: config.settings lê o ambiente na importação
+    from config.settings import settings
+    from db import db
+    from utils import scraping
+    from utils.pipeline import Finalizador
+    from scripts import download
+
+    app = criar_app(config)
+    servidor = _subir_portal(app, args.porta)
+    db.init_db()
+
+    medidor = Medidor()
+    download.HEARTBEAT = pasta / "heartbeat.json"
+    download.do_login = medidor.cronometrar("login", download.do_login)
+    download.abrir_os = medidor.cronometrar("abrir_os", download.abrir_os)
+    download.fechar_os = medidor.cronometrar("fechar_os", download.fechar_os)
+    download.espera_download = medidor.cronometrar("espera_download", download.espera_download)
+    download.baixar_anexos_http = medidor.cronometrar("baixar_http", download.baixar_anexos_http)
+    download.concluir_os = medidor.cronometrar("concluir_os", download.concluir_os)
+    download.baixar_anexos = medidor.cronometrar("tentativa_os", download.baixar_anexos)
+    scraping.detalhes_os = medidor.cronometrar("detalhes_os", scraping.detalhes_os)
+    mark_status = db.mark_status
+
+    def mark_status_medido(os_id, status, **kwargs):
+        mark_status(os_id, status, **kwargs)
+        medidor.status(os_id, status)
+    db.mark_status = mark_status_medido
+
+    total = settings.n_workers
+    inicio = time.monotonic()
+    fim = inicio + args.limite
+
+    def terminou() -> bool:
+        return len(medidor.sucesso) >= args.os or time.monotonic() > fim
+
+    def worker(i: int):
+        gerente = download.gerente_worker(i, total)
+        finalizador = (Finalizador(f"finalizador-{i}", ao_encerrar=db.fechar)
+                       if settings.pipeline else None)
+        try:
+            while not terminou():
+                if not download.loop_download(gerente, i, total, finalizador):
+                    time.sleep(2)       # nada vencido: espera o backoff
+        except Exception:
+            download.log.exception("Benchmark: worker %d parou", i)
+        finally:
+            if finalizador:
+                finalizador.encerrar()
+            gerente.encerrar()
+            db.fechar()
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"worker-{i}") for i in range(total)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    segundos = time.monotonic() - inicio
+    servidor.should_exit = True
+
+    relatorio = _relatorio(medidor, args.os, segundos, app.state.portal, settings)
+    _imprimir(relatorio)
+    if args.json:
+        args.json.write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Arquivos e banco do benchmark em {pasta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Portal Onvio simulado: reproduz o contrato de DOM de `utils/helpers.CSS`
+(pesquisa, grid Wijmo, detalhes, anexos, fechar) e a listagem JSON do grid,
+para medir o Cloud_1 sem tocar no portal real.
+
+Uso (na pasta Cloud_1):
+
+    uvicorn simulador.portal:app --port 8765
+
+e no .env do bot:
+
+    PORTAL_URL=http://127.0.0.1:8765/br-portal-do-cliente/service-requesting/general
+
+A página já abre "logada" (o login só confere o campo de pesquisa).
+Latência, tamanho dos anexos e falhas vêm das variáveis SIM_* (ConfigSimulador).
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+CAMINHO_PORTAL = "/br-portal-do-cliente/service-requesting/general"
+BLOCO = 64 * 1024
+
+
+class ConfigSimulador(BaseSettings):
+    """Parâmetros do portal simulado (variáveis de ambiente SIM_*)."""
+    id_inicial: int = 100_000
+    total_os: int = 50               # OS já publicadas quando o portal sobe
+    novas_por_min: float = 0         # OS novas publicadas por minuto
+
+    anexos_min: int = 1
+    anexos_max: int = 5
+    tamanho_min_kb: int = 50
+    tamanho_max_kb: int = 2048
+
+    latencia_ms: int = 150           # listagem e detalhes
+    latencia_anexo_ms: int = 300     # até o 1º byte do anexo
+    banda_kbps: int = 0              # 0 = sem limite
+
+    anexos_com_link: bool = True     # False = anexo só baixa pelo clique (sem href)
+
+    # falhas (probabilidade por chamada)
+    falha_indisponivel: float = 0.0  # pesquisa não acha a OS (→ "aguardando")
+    falha_detalhes: float = 0.0      # detalhes sem apelido (sessão "quebrada")
+    falha_anexo: float = 0.0         # HTTP 500 ao baixar um anexo
+
+    semente: int = 42
+
+    model_config = SettingsConfigDict(env_prefix="SIM_", extra="ignore")
+
+
+class Portal:
+    """
+    Estado do portal: quais OS já foram publicadas e o conteúdo de cada uma.
+    O conteúdo é determinístico por (semente, os_id); as falhas, não — uma
+    nova tentativa pode dar certo.
+    """
+
+    def __init__(self, config: ConfigSimulador):
+        self.config = config
+        self.inicio = time.monotonic()
+        self.contadores: Counter = Counter()
+        self._lock = threading.Lock()
+        self._sorteio = random.Random()
+
+    def contar(self, chave: str):
+        with self._lock:
+            self.contadores[chave] += 1
+
+    def falhou(self, probabilidade: float, chave: str) -> bool:
+        if probabilidade > 0 and self._sorteio.random() < probabilidade:
+            self.contar(chave)
+            return True
+        return False
+
+    def topo(self) -> int:
+        minutos = (time.monotonic() - self.inicio) / 60
+        novas = int(minutos * self.config.novas_por_min)
+        return self.config.id_inicial + self.config.total_os + novas - 1
+
+    def publicada(self, os_id: int) -> bool:
+        return self.config.id_inicial <= os_id <= self.topo()
+
+    def os(self, os_id: int) -> dict:
+        c = self.config
+        rnd = random.Random(c.semente * 1_000_003 + os_id)
+        anexos = [
+            {"id": f"{os_id}_{n}", "nome": f"anexo_{os_id}_{n}.dat",
+             "tamanho": rnd.randint(c.tamanho_min_kb, c.tamanho_max_kb) * 1024}
+            for n in range(rnd.randint(c.anexos_min, c.anexos_max))
+        ]
+        return {
+            "identifier": os_id,
+            "nickname": f"CLIENTE{os_id % 97:02d}",
+            "client": f"Cliente {os_id % 97:02d} Ltda",
+            "subject": f"Documentos da OS {os_id}",
+            "description": f"Segue documentação referente à OS {os_id}.",
+            "attachmentsCount": len(anexos),
+            "attachments": anexos,
+        }
+
+    def conteudo(self, os_id: int, n: int, tamanho: int) -> bytes:
+        return random.Random(f"{self.config.semente}:{os_id}:{n}").randbytes(tamanho)
+
+
+def criar_app(config: ConfigSimulador | None = None) -> FastAPI:
+    portal = Portal(config or ConfigSimulador())
+    app = FastAPI(title="Portal Onvio simulado")
+    app.state.portal = portal
+
+    async def latencia(ms: int):
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    @app.get("/", response_class=HTMLResponse)
+    @app.get(CAMINHO_PORTAL, response_class=HTMLResponse)
+    async def pagina():
+        portal.contar("pagina")
+        return HTML_PORTAL
+
+    @app.get("/api/service-requests")
+    async def listar(page: int = 0, pageSize: int = 25, search: str = ""):
+        """Listagem do grid (mais novas primeiro); `search` numérico filtra pelo ID."""
+        portal.contar("listagem")
+        await latencia(portal.config.latencia_ms)
+        busca = search.strip()
+        if busca:
+            ids = [int(busca)] if busca.isdigit() and portal.publicada(int(busca)) else []
+            if ids and portal.falhou(portal.config.falha_indisponivel, "falha_indisponivel"):
+                ids = []
+        else:
+            topo = portal.topo()
+            ini = topo - page * pageSize
+            ids = [i for i in range(ini, ini - pageSize, -1) if portal.publicada(i)]
+        itens = []
+        for i in ids:
+            os_ = portal.os(i)
+            itens.append({k: v for k, v in os_.items() if k != "attachments"})
+        return {"items": itens, "page": page, "pageSize": pageSize}
+
+    @app.get("/api/service-requests/{os_id}")
+    async def detalhes(os_id: int):
+        portal.contar("detalhes")
+        await latencia(portal.config.latencia_ms)
+        if not portal.publicada(os_id):
+            raise HTTPException(404, "OS não encontrada")
+        os_ = portal.os(os_id)
+        if portal.falhou(portal.config.falha_detalhes, "falha_detalhes"):
+            os_["nickname"] = ""
+        os_["linkAnexos"] = portal.config.anexos_com_link
+        return os_
+
+    @app.get("/anexos/{os_id}/{n}")
+    async def anexo(os_id: int, n: int):
+        portal.contar("anexos")
+        if not portal.publicada(os_id):
+            raise HTTPException(404, "OS não encontrada")
+        anexos = portal.os(os_id)["attachments"]
+        if not 0 <= n < len(anexos):
+            raise HTTPException(404, "Anexo não encontrado")
+        await latencia(portal.config.latencia_anexo_ms)
+        if portal.falhou(portal.config.falha_anexo, "falha_anexo"):
+            raise HTTPException(500, "Falha simulada")
+
+        dados = portal.conteudo(os_id, n, anexos[n]["tamanho"])
+        banda = portal.config.banda_kbps * 1024
+
+        async def corpo():
+            for i in range(0, len(dados), BLOCO):
+                pedaco = dados[i:i + BLOCO]
+                if banda:
+                    await asyncio.sleep(len(pedaco) / banda)
+                yield pedaco
+
+        return StreamingResponse(corpo(), media_type="application/octet-stream", headers={
+            "Content-Disposition": f'attachment; filename="{anexos[n]["nome"]}"',
+            "Content-Length": str(len(dados)),
+        })
+
+    @app.get("/metricas")
+    async def metricas():
+        """Chamadas atendidas e falhas injetadas desde a subida."""
+        return {"topo": portal.topo(), **portal.contadores}
+
+    return app
+
+
+HTML_PORTAL = """<!doctype html>
+<html lang="pt-br">
+<head>
+<meta charset="utf-8">
+<title>Onvio (simulado)</title>
+<style>
+  body { font-family: sans-serif; margin: 1rem; }
+  .wj-row { display: flex; gap: 1rem; border-bottom: 1px solid #ddd; padding: .25rem 0; }
+  .wj-cell { min-width: 8rem; }
+  .wj-state-active { font-weight: bold; }
+  .bento-icon-info-filled { cursor: pointer; display: inline-block; padding: 0 .5rem; }
+  .painel { border: 1px solid #888; padding: 1rem; margin-top: 1rem; }
+  [id^='a-attachment_'] { display: block; cursor: pointer; }
+</style>
+</head>
+<body>
+<input class="search__input" placeholder="Pesquisar">
+<div id="grid"></div>
+<div id="detalhes"></div>
+<script>
+const $ = s => document.querySelector(s);
+
+async function listar(busca) {
+  const r = await fetch('/api/service-requests?page=0&pageSize=25&search=' + encodeURIComponent(busca));
+  const dados = await r.json();
+  const grid = $('#grid');
+  grid.innerHTML = '';
+  dados.items.forEach((os, i) => {
+    const linha = document.createElement('div');
+    linha.className = 'wj-row';
+    linha.innerHTML =
+      '<div class="wj-cell' + (i === 0 ? ' wj-state-active' : '') + '" data-qe-id="col-identifier-row-' + i + '">' + os.identifier + '</div>' +
+      '<div class="wj-cell">' + os.nickname + '</div>' +
+      '<div class="wj-cell">' + os.subject + '</div>' +
+      '<div class="wj-cell"><span class="bento-icon-info-filled" data-os="' + os.identifier + '">&#9432;</span></div>';
+    grid.appendChild(linha);
+  });
+}
+
+async function abrir(osId) {
+  const r = await fetch('/api/service-requests/' + osId);
+  if (!r.ok) { return; }
+  const os = await r.json();
+  const anexos = os.attachments.map((a, n) => {
+    const url = '/anexos/' + os.identifier + '/' + n;
+    return os.linkAnexos
+      ? '<a id="a-attachment_' + a.id + '" href="' + url + '" download>' + a.nome + '</a>'
+      : '<span id="a-attachment_' + a.id + '" data-arquivo="' + url + '">' + a.nome + '</span>';
+  }).join('');
+  $('#detalhes').innerHTML =
+    '<div class="painel">' +
+      '<div class="filtros">' +
+        '<div class="filters-inline-group"><span>OS</span><span>' + os.identifier + '</span></div>' +
+        '<div class="filters-inline-group"><span>Apelido</span><span>' + os.nickname + '</span></div>' +
+        '<div class="filters-inline-group"><span>Cliente</span><span>' + os.client + '</span></div>' +
+      '</div>' +
+      '<div class="corpo">' +
+        '<div class="row"><div>Status</div><div><span>Aberta</span></div></div>' +
+        '<div class="row"><div>Cliente</div><div><span>' + os.client + '</span></div></div>' +
+        '<div class="row"><div>Assunto</div><div><span>' + os.subject + '</span></div></div>' +
+        '<div class="row"><div>Detalhe</div><div><p><span class="detail-data">' + os.description + '</span></p></div></div>' +
+      '</div>' +
+      '<div class="anexos">' + anexos + '</div>' +
+      '<div class="acoes"><button class="btn-lg">Fechar</button></div>' +
+    '</div>';
+}
+
+document.addEventListener('click', e => {
+  const info = e.target.closest('.bento-icon-info-filled');
+  if (info) { abrir(info.dataset.os); return; }
+  const arquivo = e.target.closest('[data-arquivo]');
+  if (arquivo) {
+    const a = document.createElement('a');
+    a.href = arquivo.dataset.arquivo;
+    a.download = '';
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+    return;
+  }
+  if (e.target.closest('button.btn-lg')) { $('#detalhes').innerHTML = ''; }
+});
+
+$('.search__input').addEventListener('keydown', e => {
+  if (e.key === 'Enter') { listar(e.target.value.trim()); }
+});
+
+listar('');
+</script>
+</body>
+</html>
+"""
+
+app = criar_app()
@@ -0,0 +1,74 @@
+import random
+from dataclasses import dataclass
+
+from config.settings import settings
+
+
+@dataclass(frozen=True)
+class Politica:
+    """
+    Backoff exponencial com jitter:
+      atraso = min(teto, base * fator ** (tentativas - 1)) * (1 ± jitter)
+    (valores em segundos)
+
+    max_tentativas: limite próprio da política (None = settings.max_attempts,
+    aplicado por db.list_due).
+    """
+    base: float
+    fator: float
+    teto: float
+    jitter: float = 0.25
+    max_tentativas: int | None = None
+
+
+# Política por tipo de falha (ver `classificar`)
+POLITICAS = {
+    # OS ainda não apareceu no grid: retentativa barata, volta logo, e
+    # continua tentando por ~1 h (1+2+4+8+15+15+15 min) — o portal costuma
+    # publicar a OS com atraso
+    "grid": Politica(base=60, fator=2, teto=15 * 60, max_tentativas=8),
+    # navegador fechou / erro de WebDriver: costuma ser transitório
+    "navegador": Politica(base=2 * 60, fator=2, teto=60 * 60),
+    # timeout de download ou de página
+    "timeout": Politica(base=5 * 60, fator=2, teto=2 * 60 * 60),
+    # baixou menos anexos que o esperado: caro, espaça bastante
+    "quantidade": Politica(base=10 * 60, fator=3, teto=6 * 60 * 60),
+    # qualquer outro erro
+    "padrao": Politica(base=15 * 60, fator=2, teto=6 * 60 * 60),
+}
+
+# Motivos que não devem voltar à fila automaticamente
+# (com settings.lotes, "excesso de anexos" volta: a OS é baixada em janelas)
+SEM_RETENTATIVA = ("excesso de anexos",)
+
+
+def classificar(status: str, motivo: str | None) -> str | None:
+    """
+    Mapeia (status, motivo) para uma chave de POLITICAS.
+    None → não reagendar.
+    """
+    if status == "aguardando":
+        return "grid"
+
+    m = (motivo or "").lower()
+    if not settings.lotes and any(s in m for s in SEM_RETENTATIVA):
+        return None
+    if "quant. baixada" in m:
+        return "quantidade"
+    if "timeout" in m or "tempo limite" in m:
+        return "timeout"
+    if any(s in m for s in ("window", "janela", "webdriver", "chrome")):
+        return "navegador"
+    return "padrao"
+
+
+def proximo_intervalo(status: str, motivo: str | None, tentativas: int) -> float | None:
+    """Segundos até a próxima tentativa, ou None se a OS não deve ser retentada."""
+    chave = classificar(status, motivo)
+    if chave is None:
+        return None
+    p = POLITICAS[chave]
+    if p.max_tentativas is not None and tentativas >= p.max_tentativas:
+        return None
+    atraso = min(p.teto, p.base * p.fator ** max(0, tentativas - 1))
+    return atraso * random.uniform(1 - p.jitter, 1 + p.jitter)
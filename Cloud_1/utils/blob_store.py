@@ -0,0 +1,115 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("blob_store")
+
+# reaproveitar um blob (guardar) e podá-lo (podar) não se cruzam no processo
+_LOCK = threading.Lock()
+
+
+def sha256_arquivo(caminho: Path) -> str:
+    """SHA-256 (hex) do conteúdo do arquivo, lido em blocos de 1 MiB."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def caminho_blob(raiz: Path, sha: str) -> Path:
+    """Local do blob no store: <raiz>/ab/cd/<sha256>."""
+    return raiz / sha[:2] / sha[2:4] / sha
+
+
+def guardar(arquivo: Path, raiz: Path) -> tuple[str, Path]:
+    """
+    Move `arquivo` para o store endereçado por conteúdo em `raiz`.
+
+    • Se já existir blob com o mesmo SHA-256 (anexo reenviado em outra OS),
+      o arquivo novo é descartado e o blob existente é reaproveitado.
+    • A gravação é atômica: move para um nome temporário e faz os.replace.
+    • O mtime do blob é renovado (uso recente): `podar` não o remove antes
+      de o chamador criar o hardlink.
+
+    Retorno:
+      (sha256, caminho do blob)
+    """
+    sha = sha256_arquivo(arquivo)
+    blob = caminho_blob(raiz, sha)
+    with _LOCK:
+        try:
+            os.utime(blob)
+        except FileNotFoundError:
+            pass
+        else:
+            arquivo.unlink()
+            log.info("Blob reaproveitado: %s (%s)", arquivo.name, sha[:12])
+            return sha, blob
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    tmp = blob.with_name(f"{sha}.{uuid.uuid4().hex}.tmp")
+    shutil.move(arquivo, tmp)
+    os.utime(tmp)
+    os.replace(tmp, blob)
+    return sha, blob
+
+
+def podar(raiz: Path, idade_min_s: float = 3600) -> tuple[int, int]:
+    """
+    Remove os blobs que nenhuma pasta usa mais: st_nlink == 1 (só o próprio
+    store) e sem uso há pelo menos `idade_min_s` (margem para o blob recém
+    guardado ganhar o hardlink). Pastas vazias do store também saem.
+
+    Retorno:
+      (blobs removidos, bytes liberados)
+    """
+    limite = time.time() - idade_min_s
+    removidos = liberados = 0
+    for pasta, _, arquivos in os.walk(raiz, topdown=False):
+        for nome in arquivos:
+            if nome.endswith(".tmp"):
+                continue
+            caminho = os.path.join(pasta, nome)
+            with _LOCK:
+                try:
+                    st = os.stat(caminho)
+                    if st.st_nlink > 1 or st.st_mtime > limite:
+                        continue
+                    os.unlink(caminho)
+                except FileNotFoundError:
+                    continue
+            removidos += 1
+            liberados += st.st_size
+        if pasta != str(raiz):
+            try:
+                os.rmdir(pasta)         # só sai se ficou vazia
+            except OSError:
+                pass
+    if removidos:
+        log.info("Store podado: %d blobs sem uso, %.1f MB liberados",
+                 removidos, liberados / (1024 * 1024))
+    return removidos, liberados
+
+
+def vincular(origem: str | Path, destino: str | Path) -> str | Path:
+    """
+    Materializa `origem` em `destino` como hardlink; se o sistema de arquivos
+    não permitir (volumes diferentes, FS sem suporte), faz cópia comum.
+
+    Tem a assinatura de `copy_function` de shutil.copytree.
+    """
+    destino = Path(destino)
+    if destino.exists():
+        destino.unlink()
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+    return destino
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+
+class Cadencia:
+    """
+    Intervalo adaptativo entre sondagens do portal.
+
+      • atividade() → volta ao intervalo mínimo (houve OS nova / trabalho)
+      • ocioso()    → multiplica o intervalo por `fator`, até o teto
+      • teto        → `maximo_expediente` em dias úteis entre `inicio` e `fim`
+                      (hora local), `maximo` fora do expediente
+
+    Valores em segundos.
+    """
+
+    def __init__(self, minimo: float, maximo: float, maximo_expediente: float,
+                 inicio: int = 8, fim: int = 18, fator: float = 2.0):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.maximo_expediente = maximo_expediente
+        self.inicio = inicio
+        self.fim = fim
+        self.fator = fator
+        self._atual = minimo
+
+    def em_expediente(self, agora: datetime | None = None) -> bool:
+        agora = agora or datetime.now()
+        return agora.weekday() < 5 and self.inicio <= agora.hour < self.fim
+
+    def teto(self) -> float:
+        return self.maximo_expediente if self.em_expediente() else self.maximo
+
+    def atividade(self):
+        self._atual = self.minimo
+
+    def ocioso(self):
+        self._atual = min(self._atual * self.fator, self.teto())
+
+    def intervalo(self) -> float:
+        return max(self.minimo, min(self._atual, self.teto()))
@@ -0,0 +1,164 @@
+import json
+import time
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("download_events")
+
+# Arquivo novo na pasta há esse tempo sem nenhum evento → o log não traz os
+# eventos de download (ex.: Chrome/ChromeDriver que não os repassam)
+GRACA_ARQUIVO = 1.0
+# Nem evento nem arquivo nesse prazo após o clique → devolve ao polling
+GRACA_INICIO = 10
+
+# drivers em que os eventos já se mostraram ausentes: não tenta de novo
+_SEM_EVENTOS: "weakref.WeakSet" = weakref.WeakSet()
+
+
+@dataclass
+class DownloadConcluido:
+    """Resultado de um download acompanhado pelos eventos do Chrome."""
+    caminho: Path
+    tamanho: int
+    segundos: float
+
+
+class MonitorDownloads:
+    """
+    Acompanha os downloads do Chrome pelos eventos do DevTools
+    (`Page.downloadWillBegin` / `Page.downloadProgress`), lidos do log de
+    performance do ChromeDriver — que só repassa os domínios Network, Page e
+    Tracing (os `Browser.download*` não chegam por ele).
+
+    Requer o driver criado com `goog:loggingPrefs={"performance": "ALL"}` e
+    `enablePage` (ver `get_driver(..., eventos=True)`).
+
+    Os eventos só são dados como disponíveis depois do primeiro que chega: se
+    o arquivo do anexo aparece na pasta sem evento nenhum, o monitor desliga
+    na hora (e para sempre nesse driver) e o chamador segue pelo polling.
+
+    Uso:
+        monitor = MonitorDownloads(driver, pasta)
+        if monitor.ativar():
+            monitor.marcar()
+            <clique no anexo>
+            concluido = monitor.espera(timeout=600)   # None → use o polling
+    """
+
+    def __init__(self, driver, download_dir: Path):
+        self.driver = driver
+        self.download_dir = download_dir
+        self.ativo = False
+        self._downloads: dict[str, dict] = {}
+        self._antes: set[str] = set()
+
+    def ativar(self) -> bool:
+        """Liga os eventos de download; False se o driver não suportar CDP/log."""
+        if self.driver in _SEM_EVENTOS:
+            return False
+        try:
+            self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": str(self.download_dir),
+                "eventsEnabled": True,
+            })
+            self.driver.get_log("performance")          # descarta o histórico
+            self.ativo = True
+        except Exception as exc:
+            log.warning("Eventos de download indisponíveis (%s) – usando polling", exc)
+            self._desativar()
+        return self.ativo
+
+    def _desativar(self):
+        self.ativo = False
+        try:
+            _SEM_EVENTOS.add(self.driver)
+        except TypeError:
+            pass
+
+    def marcar(self):
+        """Chamar logo antes do clique: o próximo download novo é o do anexo."""
+        self._ler_eventos()
+        self._antes = set(self._downloads)
+
+    def _ler_eventos(self):
+        for entrada in self.driver.get_log("performance"):
+            msg = json.loads(entrada["message"]).get("message", {})
+            metodo = msg.get("method", "")
+            params = msg.get("params", {})
+            guid = params.get("guid")
+            if not guid:
+                continue
+
+            if metodo.endswith(".downloadWillBegin"):
+                d = self._downloads.setdefault(guid, {"inicio": time.monotonic()})
+                d["nome"] = params.get("suggestedFilename")
+            elif metodo.endswith(".downloadProgress"):
+                d = self._downloads.setdefault(guid, {"inicio": time.monotonic()})
+                d["estado"] = params.get("state")
+                d["bytes"] = int(params.get("receivedBytes", 0))
+                if d["estado"] in ("completed", "canceled") and "fim" not in d:
+                    d["fim"] = time.monotonic()
+
+    def _resolver_caminho(self, nome: str, tamanho: int, antes: set[str]) -> Path | None:
+        """
+        O Chrome renomeia colisões para "nome (n).ext"; escolhe o arquivo novo
+        com o nome sugerido (ou variante numerada) e o tamanho informado.
+        """
+        alvo = Path(nome)
+        candidatos = [self.download_dir / nome,
+                      *self.download_dir.glob(f"{alvo.stem} (*){alvo.suffix}")]
+        for c in candidatos:
+            if c.name not in antes and c.is_file() and c.stat().st_size == tamanho:
+                return c
+        return None
+
+    def espera(self, timeout: int, antes_arquivos: set[str] | None = None) -> DownloadConcluido | None:
+        """
+        Aguarda o download disparado após `marcar()` terminar.
+
+        Retorno:
+          • DownloadConcluido assim que o evento "completed" chega
+          • None se o download começou na pasta sem evento (GRACA_ARQUIVO s)
+            ou nada apareceu em GRACA_INICIO s (o monitor se desativa e o
+            chamador deve cair no polling de arquivos)
+
+        Lança TimeoutError se o download começou mas não terminou em `timeout`,
+        ou RuntimeError se o Chrome o cancelou.
+        """
+        antes_arquivos = antes_arquivos or set()
+        inicio = time.monotonic()
+        arquivo_visto = None
+        while True:
+            self._ler_eventos()
+            novos = [g for g in self._downloads if g not in self._antes]
+            agora = time.monotonic()
+
+            if not novos:
+                if arquivo_visto is None and any(
+                        p.name not in antes_arquivos for p in self.download_dir.iterdir()):
+                    arquivo_visto = agora
+                sem_evento = arquivo_visto is not None and agora - arquivo_visto > GRACA_ARQUIVO
+                if sem_evento or agora - inicio > GRACA_INICIO:
+                    log.warning("Download sem eventos do DevTools – desativando eventos")
+                    self._desativar()
+                    return None
+            else:
+                d = self._downloads[novos[0]]
+                if d.get("estado") == "canceled":
+                    self._antes.add(novos[0])
+                    raise RuntimeError(f"Download cancelado pelo Chrome: {d.get('nome')}")
+                if d.get("estado") == "completed":
+                    self._antes.add(novos[0])
+                    caminho = self._resolver_caminho(d.get("nome") or "", d["bytes"], antes_arquivos)
+                    if caminho is None:
+                        log.warning("Download %s concluído, mas arquivo não localizado", d.get("nome"))
+                        return None
+                    return DownloadConcluido(caminho, d["bytes"], d["fim"] - d["inicio"])
+
+            if agora - inicio > timeout:
+                raise TimeoutError("Download não terminou no tempo limite")
+            time.sleep(0.2)
@@ -0,0 +1,164 @@
+import threading
+from pathlib import Path
+from typing import Callable
+
+from utils import http_download
+from utils.helpers import CSS
+from utils.logging_config import configure_logging
+
+log = configure_logging("driver_manager")
+
+# Uma ida ao navegador: URL atual, campo de pesquisa presente e heap JS da aba.
+# Se a janela/sessão morreu, o execute_script lança exceção.
+_JS_ESTADO = """
+const mem = (performance.memory && performance.memory.usedJSHeapSize) || 0;
+return [location.href, !!document.querySelector(arguments[0]), mem];
+"""
+
+
+class GerenciadorDriver:
+    """
+    Mantém um Chrome logado vivo entre ciclos, em vez de abrir navegador e
+    refazer o login a cada volta do loop.
+
+      • obter()        → driver ativo, com sessão conferida numa única ida ao
+                         navegador (re-login só se o campo de pesquisa sumiu)
+      • registrar_os() → conta OS processadas e recicla o navegador após
+                         `max_os` OS ou quando o heap JS passa de `max_memoria_mb`
+      • trocar()       → descarta o ativo (ex.: NoSuchWindowException) e
+                         promove a reserva aquecida, se houver
+
+    Com dois perfis em `perfis`, uma reserva já logada é mantida no perfil
+    livre (o Chrome não abre dois navegadores no mesmo perfil).
+
+    Parâmetros:
+      fabrica  — cria um driver para o perfil informado
+      login    — executa o fluxo de login (scripts.login.run)
+      perfis   — [perfil_principal] ou [perfil_principal, perfil_reserva]
+    """
+
+    def __init__(self, fabrica: Callable[[Path], object], login: Callable[[object], None],
+                 perfis: list[Path], *, max_os: int = 150, max_memoria_mb: int = 1024):
+        self.fabrica = fabrica
+        self.login = login
+        self.perfis = perfis
+        self.max_os = max_os
+        self.max_memoria_mb = max_memoria_mb
+
+        self._lock = threading.RLock()
+        self._ativo = None
+        self._perfil_ativo: Path | None = None
+        self._reserva = None
+        self._thread_reserva: threading.Thread | None = None
+        self._os_processadas = 0
+
+    # ── estado ────────────────────────────────────────────────────────────
+    def _estado(self, driver) -> tuple[bool, bool, float]:
+        """(vivo, logado, heap_mb) do driver, numa única chamada."""
+        try:
+            url, pesquisa, mem = driver.execute_script(_JS_ESTADO, CSS["pesquisa"])
+        except Exception:
+            return False, False, 0.0
+        return True, bool(pesquisa), mem / (1024 * 1024)
+
+    @staticmethod
+    def _fechar(driver):
+        http_download.descartar_sessao(getattr(driver, "session_id", None))
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    # ── reserva ───────────────────────────────────────────────────────────
+    def _perfil_livre(self) -> Path | None:
+        livres = [p for p in self.perfis if p != self._perfil_ativo]
+        return livres[0] if livres else None
+
+    def _aquecer_reserva(self, perfil: Path):
+        driver = None
+        try:
+            driver = self.fabrica(perfil)
+            self.login(driver)
+        except Exception:
+            log.warning("Falha ao aquecer navegador reserva (%s)", perfil, exc_info=True)
+            if driver is not None:
+                self._fechar(driver)        # libera o perfil
+            return
+        with self._lock:
+            self._reserva = (driver, perfil)
+        log.info("Navegador reserva pronto (%s)", perfil.name)
+
+    def _agendar_reserva(self):
+        if len(self.perfis) < 2 or self._reserva is not None:
+            return
+        if self._thread_reserva and self._thread_reserva.is_alive():
+            return
+        perfil = self._perfil_livre()
+        self._thread_reserva = threading.Thread(
+            target=self._aquecer_reserva, args=(perfil,), name="driver-reserva", daemon=True)
+        self._thread_reserva.start()
+
+    # ── ciclo de vida ─────────────────────────────────────────────────────
+    def _novo_ativo(self):
+        """Promove a reserva (esperando o aquecimento, se em curso) ou cria um driver."""
+        if self._thread_reserva and self._thread_reserva.is_alive():
+            self._thread_reserva.join()
+
+        if self._reserva is not None:
+            self._ativo, self._perfil_ativo = self._reserva
+            self._reserva = None
+            log.info("Reserva promovida a navegador ativo (%s)", self._perfil_ativo.name)
+        else:
+            self._perfil_ativo = self.perfis[0]
+            self._ativo = self.fabrica(self._perfil_ativo)
+            self.login(self._ativo)
+        self._os_processadas = 0
+        self._agendar_reserva()
+
+    def _descartar_ativo(self):
+        if self._ativo is not None:
+            self._fechar(self._ativo)
+        self._ativo = None
+        self._perfil_ativo = None
+
+    def obter(self):
+        """Driver ativo, vivo e logado."""
+        with self._lock:
+            if self._ativo is None:
+                self._novo_ativo()
+                return self._ativo
+
+            vivo, logado, _ = self._estado(self._ativo)
+            if not vivo:
+                log.warning("Navegador ativo não responde – trocando")
+                self._descartar_ativo()
+                self._novo_ativo()
+            elif not logado:
+                log.info("Sessão expirada – refazendo login")
+                self.login(self._ativo)
+            return self._ativo
+
+    def trocar(self):
+        """Descarta o navegador ativo (travou/fechou) e promove a reserva."""
+        with self._lock:
+            self._descartar_ativo()
+            self._novo_ativo()
+
+    def registrar_os(self):
+        """Conta uma OS e recicla o navegador se passou dos limites."""
+        with self._lock:
+            self._os_processadas += 1
+            _, _, heap_mb = self._estado(self._ativo)
+            if self._os_processadas >= self.max_os or heap_mb > self.max_memoria_mb:
+                log.info("Reciclando navegador (%d OS, heap %.0f MB)", self._os_processadas, heap_mb)
+                self.trocar()
+
+    def encerrar(self):
+        """Fecha ativo e reserva."""
+        with self._lock:
+            if self._thread_reserva and self._thread_reserva.is_alive():
+                self._thread_reserva.join()
+            self._descartar_ativo()
+            if self._reserva is not None:
+                self._fechar(self._reserva[0])
+                self._reserva = None
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("grid")
+
+PARCIAIS = (".crdownload", ".tmp")
+
+
+def arquivos_no_node(driver) -> set[str]:
+    """Nomes dos arquivos já na pasta de download do node do Grid."""
+    return set(driver.get_downloadable_files())
+
+
+def limpar_node(driver):
+    """Apaga os downloads do node (o Grid não limpa entre OS)."""
+    try:
+        driver.delete_downloadable_files()
+    except Exception:
+        log.warning("Não consegui limpar os downloads do node", exc_info=True)
+
+
+def espera_download_node(driver, destino: Path, antes: set[str], timeout: int = 600,
+                         intervalo: float = 1.0, post_delay: float = 2.0) -> list[Path]:
+    """
+    Equivalente remoto de helpers.espera_download: espera surgir no node
+    arquivo novo e completo (fora de `antes`) e o traz para `destino`
+    (downloads gerenciados do Grid, `se:downloadsEnabled`).
+    """
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        atuais = arquivos_no_node(driver)
+        novos = sorted(n for n in atuais - antes if not n.endswith(PARCIAIS))
+        if novos and not any(n.endswith(PARCIAIS) for n in atuais):
+            time.sleep(post_delay)
+            destino.mkdir(parents=True, exist_ok=True)
+            for nome in novos:
+                driver.download_file(nome, str(destino))
+            return [destino / nome for nome in novos]
+        time.sleep(intervalo)
+    raise TimeoutError(f"Nenhum download concluído no node em {timeout} s")
@@ -1,5 +1,4 @@
 import time
-import shutil
 from pathlib import Path
 from selenium.common.exceptions import WebDriverException, TimeoutException, NoSuchWindowException
 
@@ -31,23 +30,6 @@ def espera_download(download_dir: Path, antes: set[str], timeout: int = 600, pos
     raise TimeoutError("Download não terminou no tempo limite")
 
 
-def mover_arquivos(arquivos: list[Path], destino: Path):
-    """
-    Move cada arquivo em `arquivos` para a pasta `destino`.
-
-    Parâmetros:
-      arquivos: list[Path] — lista de arquivos a mover
-      destino: Path — pasta de destino. É criada (com pais) se não existir.
-
-    Observações:
-      - Usa shutil.move, preservando nome original.
-      - Se ocorrer erro de I/O, a exceção será propagada para o chamador tratar.
-    """
-    destino.mkdir(parents=True, exist_ok=True)
-    for arq in arquivos:
-        shutil.move(arq, destino / arq.name)
-
-
 def formatar_erro_usuario(e: Exception) -> str:
     """Traduz exceções técnicas em mensagens amigáveis para o heartbeat."""
 
@@ -94,4 +76,12 @@ CSS = {
     "descricao": "span.detail-data:nth-child(1)",
     # botão de fechar detalhes
     "fechar": "button.btn-lg:nth-child(1)",
+    # células de ID no grid (Wijmo) e fallback em tabela simples
+    "grid_ids": "div.wj-cell[data-qe-id^='col-identifier-row']",
+    "grid_ids_tabela": "tbody tr td:first-child",
+    # célula de ID da linha ativa (topo do grid) e fallback em tabela
+    "grid_topo": "div.wj-cell.wj-state-active[data-qe-id^='col-identifier-row']",
+    "grid_topo_tabela": "tbody tr:first-child td:first-child",
+    # célula de ID da primeira linha (resultado da pesquisa)
+    "grid_linha0": "div[data-qe-id='col-identifier-row-0']",
 }
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.message import Message
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("http_download")
+
+# Uma sessão HTTP por navegador (chave = session_id do WebDriver)
+_SESSOES: dict[str, requests.Session] = {}
+_SESSOES_LOCK = threading.Lock()
+
+
+def sessao_do_driver(driver, pool: int) -> requests.Session:
+    """
+    Devolve a sessão HTTP associada ao navegador, com pool keep-alive de
+    `pool` conexões, User-Agent do Chrome e os cookies autenticados atuais.
+
+    A sessão é reaproveitada entre OS; os cookies são recopiados a cada
+    chamada para acompanhar renovações de token do portal.
+    """
+    with _SESSOES_LOCK:
+        sessao = _SESSOES.get(driver.session_id)
+        if sessao is None:
+            sessao = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool,
+                pool_maxsize=pool,
+                max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+            )
+            sessao.mount("https://", adapter)
+            sessao.mount("http://", adapter)
+            sessao.headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
+            _SESSOES[driver.session_id] = sessao
+
+    for c in driver.get_cookies():
+        sessao.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+    return sessao
+
+
+def descartar_sessao(session_id: str | None):
+    """Fecha e esquece a sessão HTTP do navegador encerrado (libera o pool)."""
+    with _SESSOES_LOCK:
+        sessao = _SESSOES.pop(session_id, None)
+    if sessao is not None:
+        sessao.close()
+
+
+def _nome_arquivo(resp: requests.Response, url: str, padrao: str) -> str:
+    """Nome do arquivo pelo Content-Disposition (RFC 6266/2231) ou pela URL."""
+    cd = resp.headers.get("Content-Disposition")
+    if cd:
+        msg = Message()
+        msg["content-disposition"] = cd
+        if nome := msg.get_filename():
+            return Path(nome).name
+    nome = Path(unquote(urlparse(url).path)).name
+    return nome or padrao
+
+
+def baixar_urls(sessao: requests.Session, itens: list[tuple], destino: Path,
+                max_paralelo: int, timeout: int = 120) -> tuple[dict, list]:
+    """
+    Baixa em paralelo (no máximo `max_paralelo` simultâneos) cada (chave, url)
+    de `itens`, gravando em streaming direto na pasta `destino`.
+
+    • Arquivo em andamento fica como "<nome>.tmp" e só é renomeado ao final,
+      igual ao Chrome, para que as checagens de “download em andamento” valham.
+    • Nomes repetidos recebem sufixo " (n)", como o Chrome faz.
+
+    Retorno:
+      (baixados, falhas) — {chave: Path do arquivo} e lista das chaves que
+      falharam (o chamador decide o fallback).
+    """
+    reservados: set[str] = set()
+    lock = threading.Lock()
+
+    def reservar(nome: str) -> Path:
+        base, ext = Path(nome).stem, Path(nome).suffix
+        candidato, n = nome, 1
+        with lock:
+            while candidato in reservados or (destino / candidato).exists():
+                candidato = f"{base} ({n}){ext}"
+                n += 1
+            reservados.add(candidato)
+        return destino / candidato
+
+    def baixar(chave, url) -> Path:
+        with sessao.get(url, stream=True, timeout=(10, timeout)) as r:
+            r.raise_for_status()
+            final = reservar(_nome_arquivo(r, url, f"anexo_{chave}"))
+            tmp = final.with_name(final.name + ".tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    for bloco in r.iter_content(chunk_size=1 << 16):
+                        f.write(bloco)
+                tmp.replace(final)
+            except Exception:
+                tmp.unlink(missing_ok=True)
+                raise
+            return final
+
+    baixados, falhas = {}, []
+    with ThreadPoolExecutor(max_workers=max_paralelo) as pool:
+        futuros = {pool.submit(baixar, chave, url): chave for chave, url in itens}
+        for fut in as_completed(futuros):
+            chave = futuros[fut]
+            try:
+                baixados[chave] = fut.result()
+                log.info("HTTP: anexo %s baixado: %s", chave, baixados[chave].name)
+            except Exception as exc:
+                log.warning("HTTP: falha no anexo %s (%s) – vai pelo clique", chave, exc)
+                falhas.append(chave)
+    return baixados, falhas
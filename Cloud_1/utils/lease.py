@@ -0,0 +1,63 @@
+import threading
+from typing import Callable
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("lease")
+
+
+class Lease:
+    """
+    Posse de uma OS enquanto um worker a processa, mantida por heartbeat.
+
+      • iniciar() → começa a renovar a posse a cada `heartbeat_s` (thread)
+      • liberar() → para o heartbeat e devolve a OS
+
+    Se o processo morrer, o heartbeat para junto e a posse vence sozinha
+    (db.reivindicar volta a entregar a OS a outro worker). Se a renovação
+    falhar porque outro worker já a reivindicou, `perdida` é sinalizado e
+    quem processa a OS deve abandoná-la sem gravar nada.
+
+    Parâmetros:
+      renovar     — renovar() → bool; False = a posse foi perdida
+      devolver    — devolve a OS (db.liberar_lease)
+      ao_encerrar — chamado na thread do heartbeat ao terminar (ex.: db.fechar)
+    """
+
+    def __init__(self, os_id: int, renovar: Callable[[], bool], devolver: Callable[[], None],
+                 heartbeat_s: float, ao_encerrar: Callable[[], None] | None = None):
+        self.os_id = os_id
+        self.renovar = renovar
+        self.devolver = devolver
+        self.heartbeat_s = heartbeat_s
+        self.ao_encerrar = ao_encerrar
+        self.perdida = threading.Event()
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def iniciar(self) -> "Lease":
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.os_id}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def _heartbeat(self):
+        try:
+            while not self._parar.wait(self.heartbeat_s):
+                try:
+                    if not self.renovar():
+                        log.warning("OS %s: posse perdida (vencida e reivindicada por outro worker)",
+                                    self.os_id)
+                        self.perdida.set()
+                        return
+                except Exception:
+                    log.warning("OS %s: falha ao renovar a posse", self.os_id, exc_info=True)
+        finally:
+            if self.ao_encerrar is not None:
+                self.ao_encerrar()
+
+    def liberar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.devolver()
@@ -0,0 +1,48 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("pipeline")
+
+
+class Finalizador:
+    """
+    Uma thread de fundo que executa, em ordem, as tarefas de disco/banco de
+    cada OS (mover, copiar, TXT, status, fila) enquanto o navegador do worker
+    já trabalha na OS seguinte.
+
+      • enviar(f, *args) → agenda f(*args) e retorna na hora
+      • aguardar()       → bloqueia até todas as tarefas enviadas terminarem
+      • encerrar()       → aguarda e desliga a thread (rodando antes, nela,
+                           `ao_encerrar` — ex.: db.fechar da conexão da thread)
+
+    As tarefas devem tratar os próprios erros; o que escapar é só registrado
+    no log, para não derrubar o worker.
+    """
+
+    def __init__(self, nome: str = "finalizador", ao_encerrar: Callable | None = None):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=nome)
+        self._futuros: list[Future] = []
+        self._ao_encerrar = ao_encerrar
+
+    def enviar(self, funcao: Callable, *args):
+        self._futuros = [f for f in self._futuros if not f.done()]
+        self._futuros.append(self._pool.submit(self._rodar, funcao, *args))
+
+    @staticmethod
+    def _rodar(funcao: Callable, *args):
+        try:
+            funcao(*args)
+        except Exception:
+            log.exception("Tarefa do finalizador falhou")
+
+    def aguardar(self):
+        wait(self._futuros)
+        self._futuros.clear()
+
+    def encerrar(self):
+        if self._ao_encerrar is not None:
+            self.enviar(self._ao_encerrar)
+        self.aguardar()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,172 @@
+import json
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("portal_api")
+
+# Nomes de campo aceitos em cada item da listagem (primeiro que existir vence)
+CAMPOS_ID = ("identifier", "id", "number", "requestNumber", "serviceRequestNumber")
+CAMPOS_APELIDO = ("nickname", "apelido", "clientNickname", "customerNickname", "clientName")
+CAMPOS_ASSUNTO = ("subject", "assunto", "title")
+CAMPOS_ANEXOS = ("attachmentsCount", "attachmentCount", "totalAttachments", "attachments")
+
+# Parâmetros de paginação reconhecidos: página (n, n+1…) ou deslocamento (0, tam, 2·tam…)
+PARAMS_PAGINA = ("page", "pageNumber", "pageIndex")
+PARAMS_DESLOCAMENTO = ("skip", "$skip", "offset", "start")
+
+# Cabeçalhos que não devem ser repetidos na reprodução da chamada
+_CABECALHOS_FORA = {"content-length", "cookie", "host", "accept-encoding"}
+
+
+@dataclass
+class Requisicao:
+    """XHR de listagem capturado do SPA (reproduzível fora do navegador)."""
+    url: str
+    metodo: str
+    cabecalhos: dict
+    corpo: str | None
+
+
+def _primeiro(item: dict, campos: tuple):
+    for c in campos:
+        if item.get(c) not in (None, ""):
+            return item[c]
+    return None
+
+
+def _lista_de_itens(dados) -> list[dict]:
+    """Acha a lista de OS no JSON: a raiz, ou o 1º valor que seja lista de objetos."""
+    if isinstance(dados, list):
+        return [d for d in dados if isinstance(d, dict)]
+    if isinstance(dados, dict):
+        for chave in ("items", "data", "results", "value", "content", "records"):
+            if isinstance(dados.get(chave), list):
+                return _lista_de_itens(dados[chave])
+        for valor in dados.values():
+            if isinstance(valor, list) and valor and isinstance(valor[0], dict):
+                return valor
+    return []
+
+
+def normalizar(item: dict) -> dict | None:
+    """
+    Item do portal → {"os_id", "apelido", "assunto", "anexos_total"}.
+    None se o item não tiver ID numérico.
+    """
+    os_id = _primeiro(item, CAMPOS_ID)
+    if os_id is None or not str(os_id).isdigit():
+        return None
+    anexos = _primeiro(item, CAMPOS_ANEXOS)
+    if isinstance(anexos, list):
+        anexos = len(anexos)
+    return {
+        "os_id": int(os_id),
+        "apelido": _primeiro(item, CAMPOS_APELIDO),
+        "assunto": _primeiro(item, CAMPOS_ASSUNTO),
+        "anexos_total": int(anexos) if isinstance(anexos, (int, str)) and str(anexos).isdigit() else None,
+    }
+
+
+def _itens(dados) -> list[dict]:
+    return [n for n in map(normalizar, _lista_de_itens(dados)) if n]
+
+
+def capturar_listagem(driver, padrao_url: str, gatilho, timeout: int = 15) -> tuple[Requisicao, list[dict]] | None:
+    """
+    Captura o XHR JSON que o SPA faz para montar o grid.
+
+    1) descarta o log de performance acumulado
+    2) chama `gatilho()` (ex.: recarregar o grid)
+    3) lê os eventos Network.* até achar uma resposta JSON, cuja URL contenha
+       `padrao_url`, com itens de OS reconhecíveis
+
+    Requer o driver com log de performance de rede (get_driver(..., rede=True)).
+    Retorno: (requisição reproduzível, 1ª página normalizada) ou None.
+    """
+    driver.get_log("performance")
+    gatilho()
+
+    pedidos: dict[str, dict] = {}
+    prontos: list[str] = []
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        for entrada in driver.get_log("performance"):
+            msg = json.loads(entrada["message"]).get("message", {})
+            metodo, params = msg.get("method"), msg.get("params", {})
+            rid = params.get("requestId")
+            if metodo == "Network.requestWillBeSent" and padrao_url in params["request"]["url"]:
+                pedidos[rid] = {"req": params["request"]}
+            elif metodo == "Network.responseReceived" and rid in pedidos:
+                pedidos[rid]["json"] = "json" in params["response"].get("mimeType", "")
+            elif metodo == "Network.loadingFinished" and pedidos.get(rid, {}).get("json"):
+                prontos.append(rid)
+
+        for rid in reversed(prontos):
+            try:
+                corpo = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": rid})
+                itens = _itens(json.loads(corpo["body"]))
+            except Exception:
+                continue
+            if itens:
+                r = pedidos[rid]["req"]
+                cab = {k: v for k, v in r.get("headers", {}).items()
+                       if k.lower() not in _CABECALHOS_FORA and not k.startswith(":")}
+                return Requisicao(r["url"], r.get("method", "GET"), cab, r.get("postData")), itens
+        prontos.clear()
+        time.sleep(0.3)
+
+    log.warning("Listagem JSON do portal não capturada (padrão %r)", padrao_url)
+    return None
+
+
+def _pagina(req: Requisicao, n: int, tamanho: int) -> tuple[str, str | None] | None:
+    """(url, corpo) da página `n` (0 = a capturada); None se não achar o parâmetro."""
+    partes = urlsplit(req.url)
+    query = dict(parse_qsl(partes.query))
+    corpo = json.loads(req.corpo) if req.corpo else None
+    alvos = [query] + ([corpo] if isinstance(corpo, dict) else [])
+
+    for alvo in alvos:
+        for p in PARAMS_PAGINA + PARAMS_DESLOCAMENTO:
+            if p in alvo and str(alvo[p]).isdigit():
+                inicial = int(alvo[p])
+                passo = 1 if p in PARAMS_PAGINA else tamanho
+                alvo[p] = inicial + n * passo if alvo is corpo else str(inicial + n * passo)
+                url = urlunsplit(partes._replace(query=urlencode(query)))
+                return url, json.dumps(corpo) if corpo is not None else None
+    return None
+
+
+def listar(sessao, req: Requisicao, primeira: list[dict], *, ate_id: int | None,
+           max_paginas: int) -> list[dict]:
+    """
+    Pagina a listagem capturada pela sessão HTTP autenticada do navegador
+    (`sessao` = http_download.sessao_do_driver(...)).
+
+    Para quando: a página vem vazia, já alcançou IDs ≤ `ate_id` (os mais novos
+    vêm primeiro), o parâmetro de paginação não é reconhecido ou chegou a
+    `max_paginas`. ate_id=None → só a primeira página.
+    """
+    itens = list(primeira)
+    if ate_id is None:
+        return itens
+
+    tamanho = len(primeira)
+    for n in range(1, max_paginas):
+        if not itens or min(i["os_id"] for i in itens) <= ate_id:
+            break
+        pagina = _pagina(req, n, tamanho)
+        if pagina is None:
+            log.info("Paginação não reconhecida em %s – usando só a 1ª página", req.url)
+            break
+        url, corpo = pagina
+        r = sessao.request(req.metodo, url, headers=req.cabecalhos, data=corpo, timeout=30)
+        r.raise_for_status()
+        novos = _itens(r.json())
+        if not novos:
+            break
+        itens += novos
+    return itens
@@ -0,0 +1,84 @@
+from utils.helpers import CSS
+
+# Cada função abaixo faz UMA ida ao navegador (execute_script devolvendo JSON),
+# em vez de vários find_element/.text encadeados.
+
+_JS_IDS = r"""
+const [seletores, n] = arguments;
+for (const sel of seletores) {
+    const els = Array.from(document.querySelectorAll(sel));
+    if (els.length) {
+        return els.slice(0, n)
+                  .map(e => e.innerText.trim())
+                  .filter(t => /^\d+$/.test(t))
+                  .map(Number);
+    }
+}
+return [];
+"""
+
+_JS_DETALHES = r"""
+const css = arguments[0];
+const texto = sel => {
+    const el = document.querySelector(sel);
+    return el ? el.innerText.trim() : null;
+};
+const anexos = Array.from(document.querySelectorAll(css.anexos)).map(el => {
+    const link = (el.matches('a[href]') && el) || el.closest('a[href]') || el.querySelector('a[href]');
+    let href = link ? link.href : (el.getAttribute('data-href') || el.getAttribute('data-url'));
+    if (!href || href.startsWith('javascript') || href.endsWith('#')) { href = null; }
+    return {id: el.id, nome: el.innerText.trim(), href: href};
+});
+return {
+    apelido: texto(css.apelido),
+    assunto: texto(css.assunto),
+    descricao: texto(css.descricao),
+    anexos: anexos,
+};
+"""
+
+_JS_CLICA = """
+const el = document.querySelectorAll(arguments[0])[arguments[1]];
+if (!el) { return false; }
+el.click();
+return true;
+"""
+
+
+_JS_TEXTO = """
+const el = document.querySelector(arguments[0]);
+return el ? el.innerText.trim() : null;
+"""
+
+
+def texto(driver, seletor: str) -> str | None:
+    """Texto visível do primeiro elemento que casa com `seletor` (None se não houver)."""
+    return driver.execute_script(_JS_TEXTO, seletor)
+
+
+def ids_grid(driver, n: int) -> list[int]:
+    """Até `n` IDs visíveis no grid (Wijmo ou tabela), em ordem."""
+    return driver.execute_script(_JS_IDS, [CSS["grid_ids"], CSS["grid_ids_tabela"]], n) or []
+
+
+def topo_grid(driver) -> int | None:
+    """ID da linha ativa no topo do grid, ou None se o grid ainda não carregou."""
+    ids = driver.execute_script(_JS_IDS, [CSS["grid_topo"], CSS["grid_topo_tabela"]], 1)
+    return ids[0] if ids else None
+
+
+def detalhes_os(driver) -> dict:
+    """
+    Payload completo da OS aberta:
+
+      {"apelido": str | None, "assunto": str | None, "descricao": str | None,
+       "anexos": [{"id": "a-attachment_…", "nome": str, "href": str | None}, …]}
+
+    Os anexos vêm na ordem do DOM; href=None quando não há link resolvível.
+    """
+    return driver.execute_script(_JS_DETALHES, CSS)
+
+
+def clicar_anexo(driver, indice: int) -> bool:
+    """Clica no anexo de posição `indice` (ordem do DOM) sem re-localizar via WebDriver."""
+    return bool(driver.execute_script(_JS_CLICA, CSS["anexos"], indice))
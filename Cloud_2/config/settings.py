@@ -28,6 +28,32 @@ class Settings(BaseSettings):
     triage_db_path: Path = ROOT_DIR / "triage_status.db"
     max_attempts: int = 3
     sleep_seconds: int = 10
+    # Pastas do cliente como hardlinks da triagem (cópia se o FS não permitir)
+    vincular_arquivos: bool = False
+    # Classifica cada anexo assim que o Cloud_1 o publica (fila anexos_queue)
+    pre_triagem: bool = False
+    # Document AI: chamadas em paralelo sob token bucket + janela AIMD
+    # (sobe com sucessos, corta pela metade em 429 / cota excedida)
+    robson_taxa: float = 2.0               # requisições/s iniciais
+    robson_taxa_max: float = 10.0
+    robson_concorrencia: int = 2           # chamadas simultâneas iniciais
+    robson_concorrencia_max: int = 8
+    robson_tentativas: int = 5             # por página, em 429 seguidos
+    # Document AI ("Robson"): cliente único com token em cache e sessão keep-alive
+    documentai_credenciais: Path = ROOT_DIR / "keys" / "firestore-bot.json"
+    documentai_url: str = (
+        "https://us-documentai.googleapis.com/v1/projects/428021588438/locations/us/"
+        "processors/c18612c9a6186eba/processorVersions/a22a73a1fec09ef3:process"
+    )
+    documentai_timeout_conexao: float = 10
+    documentai_timeout: float = 60         # leitura
+    documentai_tentativas: int = 3         # erros 5xx / de conexão
+    # Cache de classificação por página (SHA-256 do PDF de uma página), em
+    # triage_status.db; LRU limitado a `cache_paginas_max` entradas
+    cache_paginas: bool = False
+    cache_paginas_max: int = 200_000
+    # Biblioteca de PDF da triagem: "pypdf2" (padrão) ou "pikepdf" (mais rápida)
+    pdf_backend: str = "pypdf2"
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -21,7 +21,8 @@ def _conn():
 
 def _init():
     """
-    Cria a tabela `queue` se não existir.
+    Cria as tabelas `queue` (OS completas) e `anexos_queue` (anexos
+    publicados um a um pelo Cloud_1) se não existirem.
     Executado automaticamente ao importar o módulo.
     """
     with _conn() as c:
@@ -32,6 +33,15 @@ def _init():
               enqueued_at TEXT DEFAULT CURRENT_TIMESTAMP
           )
         """)
+        c.execute("""
+          CREATE TABLE IF NOT EXISTS anexos_queue (
+              id          INTEGER PRIMARY KEY AUTOINCREMENT,
+              os_id       INTEGER,
+              caminho     TEXT,
+              sha256      TEXT,
+              enqueued_at TEXT DEFAULT CURRENT_TIMESTAMP
+          )
+        """)
         c.commit()
 
 
@@ -58,6 +68,26 @@ def pull_one() -> int | None:
         return os_id
 
 
+def pull_anexo() -> tuple[int, str, str] | None:
+    """
+    Remove e retorna o próximo anexo da fila de anexos (FIFO).
+
+    Retorno:
+      - (os_id, caminho, sha256) do anexo mais antigo, ou
+      - None se a fila estiver vazia
+    """
+    with _conn() as c:
+        row = c.execute(
+            "SELECT id, os_id, caminho, sha256 FROM anexos_queue ORDER BY id LIMIT 1"
+        ).fetchone()
+        if not row:
+            return None
+        qid, os_id, caminho, sha256 = row
+        c.execute("DELETE FROM anexos_queue WHERE id=?", (qid,))
+        c.commit()
+        return os_id, caminho, sha256
+
+
 def requeue(os_id: int) -> None:
     """
     Reinsere um `os_id` na fila, mas somente se ainda não estiver presente
@@ -1,4 +1,6 @@
+import json
 import sqlite3
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from contextlib import contextmanager
@@ -34,6 +36,11 @@ def init():
       - gerou_tomados   INTEGER (0/1)
       - gerou_extrato   INTEGER (0/1)
       - updated_at      TEXT (timestamp ISO UTC)
+
+    e as tabelas `classificacao_arquivo` (classificação por página já feita
+    na pré-triagem, chave = SHA-256 do arquivo) e `classificacao_pagina`
+    (cache LRU do Document AI, chave = SHA-256 do PDF de uma página +
+    versão do processador).
     """
     with _c() as c:
         c.execute("""
@@ -51,6 +58,23 @@ def init():
             ok_updated_at   TEXT,        
             updated_at      TEXT
         )""")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS classificacao_arquivo (
+            sha256      TEXT PRIMARY KEY,
+            paginas     TEXT,      -- JSON: [[tipo, confiança], …] por página
+            updated_at  TEXT
+        )""")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS classificacao_pagina (
+            sha256      TEXT NOT NULL,
+            versao      TEXT NOT NULL,     -- versão do processador Document AI
+            tipo        TEXT,
+            confianca   REAL,
+            criado_em   TEXT,
+            usado_em    REAL,              -- epoch do último acerto (LRU)
+            PRIMARY KEY (sha256, versao)
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_pagina_usado ON classificacao_pagina(usado_em)")
         c.commit()
 
 
@@ -273,3 +297,92 @@ def set_tomados_status(os_id: int, status: str) -> None:
                    updated_at     = datetime('now')
              WHERE os_id = ?""", (status, os_id))
         c.commit()
+
+
+def get_classificacao(sha256: str) -> list | None:
+    """
+    Classificação por página ([[tipo, confiança], …]) já calculada para o
+    arquivo com esse SHA-256, ou None se ainda não houver.
+    """
+    with _c() as c:
+        cur = c.execute("SELECT paginas FROM classificacao_arquivo WHERE sha256=?", (sha256,))
+        row = cur.fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def set_classificacao(sha256: str, paginas: list) -> None:
+    """Grava (ou substitui) a classificação por página do arquivo."""
+    with _c() as c:
+        c.execute("""
+            INSERT INTO classificacao_arquivo (sha256, paginas, updated_at)
+            VALUES (?, ?, datetime('now'))
+            ON CONFLICT(sha256) DO UPDATE
+              SET paginas = excluded.paginas,
+                  updated_at = excluded.updated_at
+        """, (sha256, json.dumps(paginas)))
+        c.commit()
+
+
+def get_classificacoes_pagina(shas: list[str], versao: str) -> dict[str, list]:
+    """
+    {sha256: [tipo, confiança]} das páginas em cache na versão do processador
+    informada (as ausentes ficam de fora). Uma consulta IN e um UPDATE em lote
+    por bloco de 500 hashes; os acertos renovam a posição no LRU.
+    """
+    achadas: dict[str, list] = {}
+    shas = list(dict.fromkeys(shas))
+    if not shas:
+        return achadas
+    agora = time.time()
+    with _c() as c:
+        for i in range(0, len(shas), 500):
+            bloco = shas[i:i + 500]
+            marcas = ",".join("?" * len(bloco))
+            rows = c.execute(
+                f"SELECT sha256, tipo, confianca FROM classificacao_pagina "
+                f"WHERE versao=? AND sha256 IN ({marcas})", (versao, *bloco)).fetchall()
+            if not rows:
+                continue
+            achadas.update({sha: [tipo, conf] for sha, tipo, conf in rows})
+            marcas = ",".join("?" * len(rows))
+            c.execute(f"UPDATE classificacao_pagina SET usado_em=? "
+                      f"WHERE versao=? AND sha256 IN ({marcas})",
+                      (agora, versao, *(r[0] for r in rows)))
+        c.commit()
+    return achadas
+
+
+def set_classificacao_pagina(itens: list[tuple[str, str, list]]) -> None:
+    """Grava (sha256, versao, [tipo, confiança]) de várias páginas numa transação."""
+    if not itens:
+        return
+    agora = time.time()
+    with _c() as c:
+        c.executemany("""
+            INSERT INTO classificacao_pagina (sha256, versao, tipo, confianca, criado_em, usado_em)
+            VALUES (?, ?, ?, ?, datetime('now'), ?)
+            ON CONFLICT(sha256, versao) DO UPDATE
+              SET tipo = excluded.tipo,
+                  confianca = excluded.confianca,
+                  usado_em = excluded.usado_em
+        """, [(sha, versao, classe[0], classe[1], agora) for sha, versao, classe in itens])
+        c.commit()
+
+
+def podar_classificacao_pagina(maximo: int) -> int:
+    """
+    Limita o cache de páginas a `maximo` entradas: passando disso, remove as
+    usadas há mais tempo até sobrar 90% do limite. Retorna quantas removeu.
+    """
+    with _c() as c:
+        total = c.execute("SELECT COUNT(*) FROM classificacao_pagina").fetchone()[0]
+        if total <= maximo:
+            return 0
+        excesso = total - int(maximo * 0.9)
+        c.execute("""
+            DELETE FROM classificacao_pagina
+             WHERE rowid IN (SELECT rowid FROM classificacao_pagina
+                             ORDER BY usado_em LIMIT ?)
+        """, (excesso,))
+        c.commit()
+        return excesso
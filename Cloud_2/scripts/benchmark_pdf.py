@@ -0,0 +1,159 @@
+"""
+Benchmark dos backends de PDF da triagem (utils/paginas_pdf.BACKENDS_PDF).
+
+Para cada PDF do corpus e cada backend, mede as três operações da triagem:
+
+  abrir     leitura do arquivo + contagem de páginas + checagem de senha
+  split     cada página como PDF de uma página (PaginasPDF.paginas())
+  regravar  o documento inteiro serializado de novo, em memória
+
+    cd Cloud_2
+    python -m scripts.benchmark_pdf caminho/para/pdfs --repeticoes 3
+
+Nada é enviado ao Document AI nem gravado no disco (fora o --json), e não
+precisa de .env, banco nem credenciais.
+PDFs protegidos entram só na medida de abertura. O relatório traz o total por
+etapa (ms), p50/p95 por arquivo, o ganho sobre o pypdf2 e os arquivos em que
+os backends discordam do número de páginas.
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from utils.paginas_pdf import BACKENDS_PDF
+
+
+def _medir(backend, caminho: Path) -> dict:
+    inicio = time.perf_counter()
+    pdf = backend(caminho)
+    criptografado = pdf.criptografado
+    total = None if criptografado else pdf.total
+    t = {"abrir": time.perf_counter() - inicio, "paginas": total}
+    if criptografado:
+        return t
+
+    inicio = time.perf_counter()
+    t["bytes_split"] = sum(len(p) for p in pdf.paginas())
+    t["split"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    t["bytes_regravar"] = len(pdf.regravar())
+    t["regravar"] = time.perf_counter() - inicio
+    return t
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def executar(arquivos: list[Path], backends: list[str], repeticoes: int) -> dict:
+    # tempos[backend][etapa] = [melhor de `repeticoes`, por arquivo]
+    tempos: dict[str, dict[str, list[float]]] = {b: defaultdict(list) for b in backends}
+    paginas: dict[str, dict[str, int | None]] = defaultdict(dict)
+    erros: dict[str, list[str]] = defaultdict(list)
+
+    # aquecimento: a importação preguiçosa (ex.: pikepdf) não entra na medida
+    for nome in backends:
+        try:
+            _medir(BACKENDS_PDF[nome], arquivos[0])
+        except Exception:
+            pass
+
+    for caminho in arquivos:
+        for nome in backends:
+            try:
+                rodadas = [_medir(BACKENDS_PDF[nome], caminho) for _ in range(repeticoes)]
+            except Exception as err:
+                erros[nome].append(f"{caminho.name}: {err}")
+                continue
+            paginas[caminho.name][nome] = rodadas[0]["paginas"]
+            for etapa in ("abrir", "split", "regravar"):
+                if etapa in rodadas[0]:
+                    tempos[nome][etapa].append(min(r[etapa] for r in rodadas))
+
+    etapas = {}
+    for nome in backends:
+        etapas[nome] = {
+            etapa: {
+                "arquivos": len(v),
+                "total_ms": round(sum(v) * 1000, 1),
+                "p50_ms": round(_percentil(v, 0.50) * 1000, 1),
+                "p95_ms": round(_percentil(v, 0.95) * 1000, 1),
+            }
+            for etapa, v in tempos[nome].items() if v
+        }
+
+    ganho = {}
+    if "pypdf2" in backends:
+        for nome in backends:
+            if nome == "pypdf2":
+                continue
+            ganho[nome] = {
+                etapa: round(statistics.fmean(tempos["pypdf2"][etapa]) /
+                             statistics.fmean(tempos[nome][etapa]), 2)
+                for etapa in ("abrir", "split", "regravar")
+                if tempos["pypdf2"][etapa] and tempos[nome][etapa]
+            }
+
+    divergentes = {arq: n for arq, n in paginas.items() if len(set(n.values())) > 1}
+    return {
+        "arquivos": len(arquivos),
+        "paginas": sum(max((n or 0 for n in por.values()), default=0) for por in paginas.values()),
+        "repeticoes": repeticoes,
+        "etapas": etapas,
+        "ganho_sobre_pypdf2": ganho,
+        "paginas_divergentes": divergentes,
+        "erros": dict(erros),
+    }
+
+
+def _imprimir(r: dict):
+    print(f"\n=== Benchmark de backends PDF ({r['arquivos']} arquivos, "
+          f"~{r['paginas']} páginas, melhor de {r['repeticoes']}) ===\n")
+    print(f"  {'backend':<10}{'etapa':<10}{'arquivos':>9}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for nome, etapas in r["etapas"].items():
+        for etapa, e in etapas.items():
+            print(f"  {nome:<10}{etapa:<10}{e['arquivos']:>9}{e['total_ms']:>12}"
+                  f"{e['p50_ms']:>10}{e['p95_ms']:>10}")
+    for nome, g in r["ganho_sobre_pypdf2"].items():
+        print(f"\n  {nome} vs pypdf2 (×, média por arquivo): {g}")
+    if r["paginas_divergentes"]:
+        print(f"\n  Contagem de páginas divergente: {r['paginas_divergentes']}")
+    for nome, falhas in r["erros"].items():
+        print(f"\n  Erros no {nome} ({len(falhas)}):")
+        for f in falhas[:10]:
+            print(f"    {f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", type=Path, help="pasta com PDFs (busca recursiva)")
+    parser.add_argument("--backends", default=",".join(BACKENDS_PDF),
+                        help=f"separados por vírgula (padrão: {','.join(BACKENDS_PDF)})")
+    parser.add_argument("--repeticoes", type=int, default=3, help="rodadas por arquivo (vale a melhor)")
+    parser.add_argument("--limite", type=int, default=None, help="usa só os N primeiros PDFs")
+    parser.add_argument("--json", type=Path, default=None, help="grava o relatório em JSON")
+    args = parser.parse_args()
+
+    backends = [b.strip().lower() for b in args.backends.split(",") if b.strip()]
+    invalidos = [b for b in backends if b not in BACKENDS_PDF]
+    if invalidos:
+        parser.error(f"backend desconhecido: {', '.join(invalidos)} (opções: {', '.join(BACKENDS_PDF)})")
+
+    arquivos = sorted(p for p in args.corpus.rglob("*") if p.suffix.lower() == ".pdf")[:args.limite]
+    if not arquivos:
+        parser.error(f"nenhum PDF em {args.corpus}")
+
+    relatorio = executar(arquivos, backends, max(1, args.repeticoes))
+    _imprimir(relatorio)
+    if args.json:
+        args.json.write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import time
+from config.settings import settings
+from utils.logging_config import configure_logging
+from db.queue_client import pull_anexo
+from db import triagem_db
+from scripts import triagem
+
+log = configure_logging("pre_triagem")
+
+
+def processar_anexo(os_id: int, caminho: str, sha256: str) -> None:
+    """
+    Classifica um anexo publicado pelo Cloud_1 enquanto o resto da OS ainda
+    baixa. Só lê o arquivo (em BAIXADOS_DIR): nada é movido nem gerado.
+    O resultado fica em `classificacao_arquivo`, pelo SHA-256, e é usado pela
+    triagem da OS (`triagem.exe`) quando o evento de OS completa chegar.
+    """
+    if os.path.splitext(caminho)[1].lower() != '.pdf':
+        return
+    if triagem_db.get_classificacao(sha256) is not None:
+        log.info("OS %s: %s já classificado (hash conhecido)", os_id, os.path.basename(caminho))
+        return
+    if not os.path.exists(caminho):
+        log.warning("OS %s: anexo %s não existe mais", os_id, caminho)
+        return
+
+    classes = triagem.classificar_paginas(caminho)
+    if classes:
+        triagem_db.set_classificacao(sha256, classes)
+        log.info("OS %s: %s pré-classificado (%d pág.)", os_id, os.path.basename(caminho), len(classes))
+
+
+def executar() -> None:
+    """Laço da pré-triagem: consome `anexos_queue` até o processo terminar."""
+    log.info("Pré-triagem iniciada")
+    while True:
+        item = pull_anexo()
+        if item is None:
+            time.sleep(settings.sleep_seconds)
+            continue
+        try:
+            processar_anexo(*item)
+        except Exception as e:
+            log.error("Falha na pré-triagem de %s: %s", item[1], e, exc_info=True)
@@ -1,28 +1,30 @@
-import time
 import datetime
-import requests
 import logging
 import rarfile
 import base64
 import os
 import shutil
-import PyPDF2
-import io
 import random
+import hashlib
+import re
+import threading
 from config.settings import settings
 from datetime import date
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
 from utils.extensoes import organiza_extensao
 from utils.logging_config import configure_logging
 from utils.extract import scan_e_extraia_recursivo, extrair_arquivos_compactados
+from utils.vinculos import copiar_ou_vincular
+from utils.rate_limit import LimitadorAIMD, LimiteExcedido, retry_after
+from utils.document_ai import ClienteDocumentAI
+from utils.paginas_pdf import abrir_pdf
 from functools import wraps
 from requests.exceptions import HTTPError, Timeout as ReqTimeout
 from zipfile import BadZipFile
 from PyPDF2.errors import PdfReadError
 from dateutil.relativedelta import relativedelta
 from db.banco_dominio import obter_codigo_empresa
-from db.triagem_db import init as triagem_init
+from db.triagem_db import (init as triagem_init, get_classificacao, get_classificacoes_pagina,
+                           set_classificacao_pagina, podar_classificacao_pagina)
 
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -59,6 +61,41 @@ LOW_CONFIDENCE_DIR = 'LOW_CONFIDENCE'
 ERRO_PROCESSAMENTO_DIR = 'ERRO_PROCESSAMENTO'
 LIMITE_PAGINAS_DIR = 'LIMITE_PAGINAS'
 
+# Resposta usada quando o Document AI não devolve entidades
+FALLBACK_ROBSON = ["extrato", 0.4]
+
+# Cota do Document AI é por projeto: um limitador para o processo inteiro
+limitador = LimitadorAIMD(
+    taxa=settings.robson_taxa, taxa_max=settings.robson_taxa_max,
+    janela=settings.robson_concorrencia, janela_max=settings.robson_concorrencia_max,
+    tentativas=settings.robson_tentativas,
+)
+
+# Credenciais em cache e conexões reaproveitadas entre páginas e threads
+cliente_robson = ClienteDocumentAI(
+    settings.documentai_credenciais, settings.documentai_url,
+    pool=settings.robson_concorrencia_max,
+    timeout=(settings.documentai_timeout_conexao, settings.documentai_timeout),
+    tentativas=settings.documentai_tentativas,
+)
+
+# Cache de páginas: a classificação só vale para a mesma versão do processador
+_versao = re.search(r"processorVersions/([^/:]+)", settings.documentai_url)
+VERSAO_PROCESSADOR = _versao.group(1) if _versao else settings.documentai_url
+_cache_lock = threading.Lock()
+_cache_contagem = {"acertos": 0, "faltas": 0}
+# o tamanho do cache só é conferido a cada PODA_A_CADA páginas gravadas
+PODA_A_CADA = 1000
+_gravadas_desde_poda = 0
+
+
+def estatisticas_cache() -> dict:
+    """Acertos/faltas do cache de páginas desde o início do processo."""
+    with _cache_lock:
+        total = _cache_contagem["acertos"] + _cache_contagem["faltas"]
+        return {**_cache_contagem,
+                "taxa_acerto": round(_cache_contagem["acertos"] / total, 3) if total else None}
+
 
 # ────────────────────────────────────────────────────────────────────────────
 # Decorator de logging e tratamento de exceções
@@ -69,6 +106,7 @@ def log_and_handle_exceptions(func):
       - Logar início e fim em INFO
       - Capturar erros HTTP, de compactação e leitura de PDF
       - Logar stack-trace em erros inesperados
+    LimiteExcedido (cota da API) não é engolido: o limitador precisa vê-lo.
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -80,6 +118,8 @@ def log_and_handle_exceptions(func):
             result = func(*args, **kwargs)
             logging.info(f"[{func.__name__}] concluído com sucesso")
             return result
+        except LimiteExcedido:
+            raise
         except (HTTPError, ReqTimeout) as err:
             logging.error(f"[{func.__name__}] erro HTTP ou timeout: {err}", exc_info=True)
         except BadZipFile:
@@ -111,39 +151,28 @@ PASTA_FINAL = 'TRIAGEM_ROBO'
 # Pipeline de classificação via Document AI (“Robson”)
 # ────────────────────────────────────────────────────────────────────────────
 @log_and_handle_exceptions
-def requisicao_robson(pdf_base64: str) -> list:
+def requisicao_robson(pdf: bytes | memoryview) -> list:
     """
-    Envia PDF (base64) para o Document AI Processor e retorna
+    Envia o PDF para o Document AI Processor e retorna
     [tipo, confiança] ordenados pela maior confiança.
     Fallback em caso de resposta inesperada: ["extrato", 0.4].
+    HTTP 429 / RESOURCE_EXHAUSTED → LimiteExcedido (tratado pelo limitador).
 
-    Atenção: o caminho de credenciais está fixo; mova para settings/.env.
+    Credenciais, URL e timeouts vêm de settings (DOCUMENTAI_*), via o
+    cliente único `cliente_robson` (token em cache, sessão keep-alive).
     """
-    credentials_path = r'C:\Users\Usuario\PycharmProjects\Cloud_2\keys\firestore-bot.json'
-    credentials = service_account.Credentials.from_service_account_file(
-        credentials_path,
-        scopes=['https://www.googleapis.com/auth/cloud-platform']
-    )
-
-    credentials.refresh(Request())
-    url = ("https://us-documentai.googleapis.com/v1/projects/428021588438/locations/us/processors/c18612c9a6186eba/"
-           "processorVersions/a22a73a1fec09ef3:process")
-
-    headers = {
-        "Authorization": f"Bearer {credentials.token}",
-        "Content-Type": "application/json; charset=utf-8"
-    }
-
+    # base64 só aqui, na fronteira com a API: uma página codificada por vez
     data = {
         "skipHumanReview": True,
         "rawDocument": {
             "mimeType": "application/pdf",
-            "content": f"{pdf_base64}"}
+            "content": base64.b64encode(pdf).decode('ascii')}
     }
 
-    response = requests.post(url,
-                             headers=headers,
-                             json=data)
+    response = cliente_robson.processar(data)
+    if response.status_code == 429 or (
+            response.status_code >= 400 and "RESOURCE_EXHAUSTED" in response.text):
+        raise LimiteExcedido(retry_after(response.headers))
 
     try:
         json_retorno = response.json()['document']['entities']
@@ -157,49 +186,87 @@ def requisicao_robson(pdf_base64: str) -> list:
             "(tipo=extrato, conf=0.4) — detalhe: %s",
             err,
         )
-        classificacao = ["extrato", 0.4]
+        classificacao = list(FALLBACK_ROBSON)
 
     return classificacao
 
 
-@log_and_handle_exceptions
-def pagina_unica(documento):
+def classificar_pdfs(paginas: list[memoryview]) -> list:
     """
-    Extrai a primeira página de um PDF único e classifica via requisicao_robson.
-    Aguarda 1.5s entre chamadas para não exceder quotas.
+    [tipo, confiança] de cada página (PDF de uma página), na ordem dada.
+
+    Com settings.cache_paginas, páginas já vistas (mesmo SHA-256 e mesma
+    versão do processador) saem do cache sem chamada nem espera; as demais
+    — uma vez cada, mesmo repetidas no lote — vão ao requisicao_robson em
+    paralelo, sob o limitador AIMD. Página cuja cota não voltou após as novas
+    tentativas recebe FALLBACK_ROBSON (que não entra no cache).
     """
-    with open(documento, 'rb') as doc_unico:
-        pdf_unico = PyPDF2.PdfReader(doc_unico)
-        dados = PyPDF2.PdfWriter()
-        dados.add_page(pdf_unico.pages[0])
-        bytes_doc = io.BytesIO()
-        dados.write(bytes_doc)
-        value_bytes = bytes_doc.getvalue()
+    global _gravadas_desde_poda
+
+    def sem_cota(_):
+        logging.warning("[classificar_pdfs] cota esgotada após novas tentativas; usando fallback")
+        return list(FALLBACK_ROBSON)
+
+    def enviar(pdfs: list[memoryview]) -> list:
+        return limitador.mapear(requisicao_robson, pdfs, em_falha=sem_cota)
+
+    if not settings.cache_paginas:
+        return enviar(paginas)
+
+    chaves = [hashlib.sha256(p).hexdigest() for p in paginas]
+    conhecidas = get_classificacoes_pagina(chaves, VERSAO_PROCESSADOR)
+    faltam: dict[str, memoryview] = {}
+    for sha, pdf in zip(chaves, paginas):
+        if sha not in conhecidas:
+            faltam.setdefault(sha, pdf)
+
+    novas = dict(zip(faltam, enviar(list(faltam.values()))))
+    validas = [(sha, VERSAO_PROCESSADOR, c) for sha, c in novas.items()
+               if c and c != FALLBACK_ROBSON]
+    podar = False
+    with _cache_lock:
+        _cache_contagem["faltas"] += len(faltam)
+        _cache_contagem["acertos"] += len(paginas) - len(faltam)
+        _gravadas_desde_poda += len(validas)
+        if _gravadas_desde_poda >= PODA_A_CADA:
+            _gravadas_desde_poda, podar = 0, True
+    if validas:
+        set_classificacao_pagina(validas)
+    if podar:
+        podar_classificacao_pagina(settings.cache_paginas_max)
+
+    conhecidas.update(novas)
+    return [conhecidas[sha] for sha in chaves]
 
-        response = base64.b64encode(value_bytes).decode('utf-8')
-        retorno_robson = requisicao_robson(response)
-        time.sleep(1.5)
-        return retorno_robson
+
+@log_and_handle_exceptions
+def pagina_unica(documento, classes=None, pdf=None):
+    """
+    Extrai a primeira página de um PDF único e classifica via requisicao_robson
+    (ritmo controlado pelo limitador).
+    Com `classes` (classificação da pré-triagem), não chama o Robson.
+    `pdf` é o PaginasPDF já aberto por exe() (senão o arquivo é lido aqui).
+    """
+    if classes:
+        return classes[0]
+    pdf = pdf or abrir_pdf(documento, settings.pdf_backend)
+    return classificar_pdfs(pdf.paginas()[:1])[0]
 
 
 @log_and_handle_exceptions
-def varias_paginas(documento):
+def varias_paginas(documento, classes=None, pdf=None):
     """
     Classifica multi-páginas:
      - Se > 250 páginas, move inteiro para LIMITE_PAGINAS_DIR e ignora.
-     - Para cada página, classifica; se for nota_servico com confiança >0.99, faz split TOMADOS.
+     - Classifica todas as páginas em paralelo (limitador AIMD); cada nota_servico
+       com confiança >0.99 gera split TOMADOS.
      - Retorna classificação da primeira página.
+    Com `classes` (uma por página, da pré-triagem), só faz os splits.
+    `pdf` é o PaginasPDF já aberto por exe() (senão o arquivo é lido aqui).
     """
 
-    def split_tomados(base64_string, nome):
-        """Gera PDF de primeira página em pasta TOMADOS."""
-        # decodifica e abre o PDF
-        pdf_bytes = base64.b64decode(base64_string)
-        pdf_file_like = io.BytesIO(pdf_bytes)
-        reader = PyPDF2.PdfReader(pdf_file_like)
-        page_writer = PyPDF2.PdfWriter()
-        page_writer.add_page(reader.pages[0])
-
+    def split_tomados(pagina: memoryview, nome):
+        """Grava em TOMADOS a página (já um PDF de uma página), sem reprocessar."""
         rel = os.path.relpath(nome, BASE_TRIAGEM)
         pasta_mesa = rel.split(os.sep, 1)[0]
 
@@ -209,42 +276,47 @@ def varias_paginas(documento):
         split_name = f"SPLIT_DOCUMENTO_{random.randint(10000, 99999)}_{os.path.basename(nome)}"
         destino = os.path.join(pasta_tomados, split_name)
         with open(destino, 'wb') as novo_pdf:
-            page_writer.write(novo_pdf)
+            novo_pdf.write(pagina)
         logging.info(f"[varias_paginas] página TOMADO salva: {destino}")
 
     caminho_absoluto_documento = os.path.abspath(documento)
-    with open(caminho_absoluto_documento, 'rb') as document:
-        pdf_completo = PyPDF2.PdfReader(document)
+    pdf = pdf or abrir_pdf(caminho_absoluto_documento, settings.pdf_backend)
+
+    if pdf.total > 250:
+        logging.info(f"PDF {documento} possui mais de 300 páginas, movendo para a pasta '{LIMITE_PAGINAS_DIR}'.")
+        os.makedirs(LIMITE_PAGINAS_DIR, exist_ok=True)
+
+        novo_caminho = os.path.join(LIMITE_PAGINAS_DIR, os.path.basename(documento))
+        shutil.move(caminho_absoluto_documento, novo_caminho)
 
-        if len(pdf_completo.pages) > 250:
-            logging.info(f"PDF {documento} possui mais de 300 páginas, movendo para a pasta '{LIMITE_PAGINAS_DIR}'.")
-            os.makedirs(LIMITE_PAGINAS_DIR, exist_ok=True)
-            document.close()
+        return ['ignore', 0]
 
-            novo_caminho = os.path.join(LIMITE_PAGINAS_DIR, os.path.basename(documento))
-            shutil.move(caminho_absoluto_documento, novo_caminho)
+    # com a pré-triagem, as páginas só são extraídas se houver split
+    robsons = classes or classificar_pdfs(pdf.paginas())
 
-            return ['ignore', 0]
+    for i, robson in enumerate(robsons):
+        if robson[0] == 'nota_servico' and robson[1] > 0.99:
+            split_tomados(pdf.paginas()[i], documento)
 
-        index = 0
-        primeira_pagina = ''
-        for page in pdf_completo.pages:
-            writer = PyPDF2.PdfWriter()
-            writer.add_page(page)
-            bytes_buffer = io.BytesIO()
-            writer.write(bytes_buffer)
-            writer_bytes = bytes_buffer.getvalue()
-            base = base64.b64encode(writer_bytes).decode('utf-8')
-            robson = requisicao_robson(base)
+    return robsons[0] if robsons else ''
 
-            if robson[0] == 'nota_servico' and robson[1] > 0.99:
-                split_tomados(base, documento)
 
-            primeira_pagina = robson if index == 0 else primeira_pagina
-            time.sleep(1.5)
-            index += 1
+@log_and_handle_exceptions
+def classificar_paginas(documento):
+    """
+    Pré-triagem: classifica cada página do PDF via requisicao_robson, sem
+    mover nem gerar arquivos. Retorna [[tipo, confiança], …] na ordem das
+    páginas, ou None se o PDF fica para a triagem normal (protegido, acima de
+    250 páginas) ou se alguma página não teve resposta válida do Robson.
+    """
+    pdf = abrir_pdf(documento, settings.pdf_backend)
+    if pdf.criptografado or pdf.total > 250:
+        return None
 
-    return primeira_pagina
+    classes = classificar_pdfs(pdf.paginas())
+    if any(not robson or robson == FALLBACK_ROBSON for robson in classes):
+        return None
+    return classes
 
 
 @log_and_handle_exceptions
@@ -327,11 +399,11 @@ def exe(pasta_mesa):
             if ext != '.pdf':
                 raise ValueError(f"Extensão não suportada: {ext}")
 
-            # --- 6) Tenta abrir o PDF ---
-            reader = PyPDF2.PdfReader(str(caminho))
-            if getattr(reader, "is_encrypted", False):
+            # --- 6) Tenta abrir o PDF (uma leitura só para todas as etapas) ---
+            pdf = abrir_pdf(str(caminho), settings.pdf_backend)
+            if pdf.criptografado:
                 raise PdfReadError("PDF protegido por senha")
-            paginas = len(reader.pages)
+            paginas = pdf.total
 
             # --- 7) PDFs muito grandes ---
             if paginas > 299:
@@ -341,10 +413,14 @@ def exe(pasta_mesa):
                 continue
 
             # --- 8) Classificação via Robson ---
+            #     (reaproveita o que a pré-triagem já classificou, pelo hash)
+            classes = get_classificacao(pdf.sha256()) if settings.pre_triagem else None
+            if classes and len(classes) != paginas:
+                classes = None
             if paginas == 1:
-                classificacao, confianca = pagina_unica(caminho)
+                classificacao, confianca = pagina_unica(caminho, classes, pdf)
             else:
-                classificacao, confianca = varias_paginas(caminho)
+                classificacao, confianca = varias_paginas(caminho, classes, pdf)
 
             # --- 9) Decide pasta de destino ---
             if confianca > 0.99 and classificacao in PASTAS:
@@ -391,6 +467,7 @@ def mover_cliente(folder_name: str) -> str:
     """
     Copia todo o conteúdo de BASE_TRIAGEM/folder_name para a estrutura Contábil e Fiscal
     do cliente, com base em códigos obtidos por obter_codigo_empresa().
+    Com settings.vincular_arquivos, cria hardlinks em vez de copiar os bytes.
     Retorna "Sucesso" ou mensagem de erro.
     """
     mes_comp, ano_comp = competencia_anterior()
@@ -432,10 +509,11 @@ def mover_cliente(folder_name: str) -> str:
             "MCALC", PASTA_FINAL, folder_name
         )
 
+        copia = copiar_ou_vincular if settings.vincular_arquivos else shutil.copy2
         os.makedirs(destino_contabil, exist_ok=True)
         os.makedirs(destino_fiscal,  exist_ok=True)
-        shutil.copytree(origem, destino_contabil, dirs_exist_ok=True)
-        shutil.copytree(origem, destino_fiscal,  dirs_exist_ok=True)
+        shutil.copytree(origem, destino_contabil, dirs_exist_ok=True, copy_function=copia)
+        shutil.copytree(origem, destino_fiscal,  dirs_exist_ok=True, copy_function=copia)
 
         logging.info(
             "Conteúdo de %s copiado para Contábil e Fiscal do cliente %s.",
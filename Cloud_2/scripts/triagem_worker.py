@@ -14,7 +14,7 @@ from db.triagem_db import (
 )
 from db.queue_client import pull_one, requeue
 from db import triagem_db
-from scripts import triagem
+from scripts import triagem, pre_triagem
 
 log = configure_logging("triage")
 triagem_db.init()
@@ -27,6 +27,8 @@ def beat(msg: str = "ok"):
         "ts": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
         "msg": msg,
     }
+    if settings.cache_paginas:
+        data["cache_paginas"] = triagem.estatisticas_cache()
     HEARTBEAT.write_text(json.dumps(data))
 
 
@@ -112,6 +114,8 @@ def process_os(job_id: int) -> None:
 if __name__ == "__main__":
     log.info("Worker Cloud_2 iniciado")
     seed_missing()
+    if settings.pre_triagem:
+        threading.Thread(target=pre_triagem.executar, name="pre-triagem", daemon=True).start()
     while True:
         job_id = pull_one()
         if job_id is None:
@@ -0,0 +1,77 @@
+import datetime
+import threading
+from pathlib import Path
+
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("document_ai")
+
+ESCOPOS = ["https://www.googleapis.com/auth/cloud-platform"]
+
+
+class ClienteDocumentAI:
+    """
+    Cliente do processador Document AI para o processo inteiro (thread-safe).
+
+      • credenciais lidas do disco uma vez; o token é renovado só quando
+        falta menos de `margem_token` para expirar (ou após um 401)
+      • sessão HTTP keep-alive com pool de `pool` conexões: sem novo
+        handshake TLS por página
+      • timeouts explícitos (conexão, leitura) e novas tentativas com backoff
+        para erros transitórios (5xx, conexão) — 429 volta para o chamador,
+        que controla o ritmo (utils/rate_limit.py)
+
+    O arquivo de credenciais só é aberto na primeira chamada.
+    """
+
+    def __init__(self, credenciais: Path, url: str, *, pool: int = 8,
+                 timeout: tuple[float, float] = (10, 60), tentativas: int = 3,
+                 margem_token: datetime.timedelta = datetime.timedelta(minutes=5)):
+        self.credenciais = credenciais
+        self.url = url
+        self.timeout = timeout
+        self.margem_token = margem_token
+
+        self._lock = threading.Lock()
+        self._creds: service_account.Credentials | None = None
+
+        self.sessao = requests.Session()
+        retry = Retry(
+            total=tentativas, connect=tentativas, read=tentativas,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            backoff_factor=0.5,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool, max_retries=retry)
+        self.sessao.mount("https://", adapter)
+        self.sessao.mount("http://", adapter)
+
+    def _token(self, forcar: bool = False) -> str:
+        with self._lock:
+            if self._creds is None:
+                self._creds = service_account.Credentials.from_service_account_file(
+                    str(self.credenciais), scopes=ESCOPOS)
+            expiry = self._creds.expiry          # UTC sem fuso (google-auth)
+            agora = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if forcar or not self._creds.token or expiry is None or expiry - agora < self.margem_token:
+                self._creds.refresh(Request(self.sessao))
+                log.info("Token do Document AI renovado (expira %s UTC)", self._creds.expiry)
+            return self._creds.token
+
+    def processar(self, corpo: dict) -> requests.Response:
+        """POST :process com o corpo JSON; refaz uma vez com token novo em 401."""
+        for forcar in (False, True):
+            resposta = self.sessao.post(
+                self.url, json=corpo, timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self._token(forcar)}",
+                         "Content-Type": "application/json; charset=utf-8"})
+            if resposta.status_code != 401:
+                break
+        return resposta
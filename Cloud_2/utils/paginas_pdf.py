@@ -0,0 +1,148 @@
+"""
+Backends de PDF do pipeline de páginas da triagem (scripts/triagem.py).
+
+Sem efeitos na importação (não lê settings nem abre bancos): também é usado
+pelo benchmark offline scripts/benchmark_pdf.py.
+"""
+import hashlib
+import io
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+import PyPDF2
+
+
+class PaginasPDF(ABC):
+    """
+    PDF lido e analisado uma única vez por arquivo na triagem.
+
+      dados          conteúdo do arquivo (também a base do SHA-256)
+      total          número de páginas
+      criptografado  PDF protegido por senha
+      paginas()      cada página como PDF de uma página (memoryview), gerado
+                     na primeira chamada e reaproveitado pelo classificador,
+                     pelo cache e pelo split de TOMADOS
+      regravar()     o documento inteiro serializado de novo (bytes)
+
+    A biblioteca de PDF fica nas subclasses (BACKENDS_PDF); abrir_pdf()
+    escolhe pelo nome (na triagem, settings.pdf_backend).
+    """
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as f:
+            self.dados = f.read()
+        self._paginas: list[memoryview] | None = None
+
+    @property
+    @abstractmethod
+    def total(self) -> int:
+        ...
+
+    @property
+    @abstractmethod
+    def criptografado(self) -> bool:
+        ...
+
+    @abstractmethod
+    def _extrair(self) -> Iterator[io.BytesIO]:
+        """Gera cada página serializada como PDF de uma página (BytesIO)."""
+
+    @abstractmethod
+    def regravar(self) -> bytes:
+        """O documento inteiro serializado de novo pela biblioteca do backend."""
+
+    def sha256(self) -> str:
+        return hashlib.sha256(self.dados).hexdigest()
+
+    def paginas(self) -> list[memoryview]:
+        if self._paginas is None:
+            # sem cópia dos bytes: a memoryview aponta para o buffer do BytesIO
+            self._paginas = [buffer.getbuffer() for buffer in self._extrair()]
+        return self._paginas
+
+
+class PaginasPyPDF2(PaginasPDF):
+    """Backend PyPDF2 (Python puro)."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.reader = PyPDF2.PdfReader(io.BytesIO(self.dados))
+
+    @property
+    def total(self) -> int:
+        return len(self.reader.pages)
+
+    @property
+    def criptografado(self) -> bool:
+        return bool(getattr(self.reader, "is_encrypted", False))
+
+    def _extrair(self):
+        for page in self.reader.pages:
+            writer = PyPDF2.PdfWriter()
+            writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            yield buffer
+
+    def regravar(self) -> bytes:
+        writer = PyPDF2.PdfWriter()
+        for page in self.reader.pages:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+
+class PaginasPikePDF(PaginasPDF):
+    """
+    Backend pikepdf (qpdf, em C++): bem mais rápido em PDFs grandes e
+    escaneados. O pikepdf só é importado quando este backend é escolhido.
+    """
+
+    def __init__(self, caminho):
+        import pikepdf
+
+        super().__init__(caminho)
+        self._pikepdf = pikepdf
+        try:
+            self.pdf = pikepdf.open(io.BytesIO(self.dados))
+        except pikepdf.PasswordError:
+            self.pdf = None
+
+    @property
+    def total(self) -> int:
+        return len(self.pdf.pages)
+
+    @property
+    def criptografado(self) -> bool:
+        return self.pdf is None or self.pdf.is_encrypted
+
+    def _extrair(self):
+        for page in self.pdf.pages:
+            with self._pikepdf.new() as novo:
+                novo.pages.append(page)
+                buffer = io.BytesIO()
+                # /ID fixo: a mesma página gera os mesmos bytes (cache de páginas)
+                novo.save(buffer, deterministic_id=True)
+            yield buffer
+
+    def regravar(self) -> bytes:
+        buffer = io.BytesIO()
+        self.pdf.save(buffer)
+        return buffer.getvalue()
+
+
+BACKENDS_PDF = {
+    "pypdf2": PaginasPyPDF2,
+    "pikepdf": PaginasPikePDF,
+}
+
+
+def abrir_pdf(caminho, backend: str = "pypdf2") -> PaginasPDF:
+    """PaginasPDF do arquivo com o backend `backend` (chave de BACKENDS_PDF)."""
+    try:
+        classe = BACKENDS_PDF[backend.lower()]
+    except KeyError:
+        raise ValueError(f"PDF_BACKEND inválido: {backend!r} "
+                         f"(opções: {', '.join(BACKENDS_PDF)})") from None
+    return classe(caminho)
@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from utils.logging_config import configure_logging
+
+log = configure_logging("rate_limit")
+
+
+class LimiteExcedido(Exception):
+    """A API recusou por cota (HTTP 429 / RESOURCE_EXHAUSTED)."""
+
+    def __init__(self, espera: float | None = None):
+        super().__init__(f"cota excedida (Retry-After={espera})")
+        self.espera = espera
+
+
+def retry_after(cabecalhos) -> float | None:
+    """Segundos do cabeçalho Retry-After (None se ausente ou em formato de data)."""
+    valor = (cabecalhos or {}).get("Retry-After")
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+class LimitadorAIMD:
+    """
+    Token bucket + janela de concorrência ajustados por AIMD, para chamadas
+    a uma API com cota (Document AI).
+
+      • taxa       → tokens por segundo (rajada de até `rajada` tokens)
+      • janela     → chamadas simultâneas permitidas
+      • sucesso    → a cada `aumento_a_cada` sucessos seguidos, janela + 1 e
+                     taxa + `passo_taxa` (até os máximos)
+      • 429 / cota → janela e taxa multiplicadas por `fator_reducao` (até os
+                     mínimos) e todas as chamadas pausam por Retry-After
+                     (ou `pausa_padrao` s)
+
+      executar(f, *args) → uma chamada limitada, com novas tentativas em 429
+      mapear(f, itens)   → f(item) para cada item, em paralelo, na ordem dada
+    """
+
+    def __init__(self, *, taxa: float, taxa_max: float, janela: int, janela_max: int,
+                 taxa_min: float = 0.2, janela_min: int = 1, rajada: int | None = None,
+                 passo_taxa: float | None = None, aumento_a_cada: int = 10,
+                 fator_reducao: float = 0.5, pausa_padrao: float = 2.0, tentativas: int = 5):
+        self.taxa, self.taxa_min, self.taxa_max = taxa, taxa_min, taxa_max
+        self.janela, self.janela_min, self.janela_max = janela, janela_min, janela_max
+        self.rajada = rajada or max(1, janela_max)
+        self.passo_taxa = passo_taxa if passo_taxa is not None else max(taxa * 0.1, 0.1)
+        self.aumento_a_cada = aumento_a_cada
+        self.fator_reducao = fator_reducao
+        self.pausa_padrao = pausa_padrao
+        self.tentativas = tentativas
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.rajada)
+        self._reposto_em = time.monotonic()
+        self._em_voo = 0
+        self._seguidos = 0
+        self._pausa_ate = 0.0
+
+    # ── bucket e janela ───────────────────────────────────────────────────
+    def _repor(self, agora: float):
+        self._tokens = min(self.rajada, self._tokens + (agora - self._reposto_em) * self.taxa)
+        self._reposto_em = agora
+
+    def adquirir(self):
+        """Bloqueia até haver vaga na janela, um token e nenhuma pausa ativa."""
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                self._repor(agora)
+                if agora < self._pausa_ate:
+                    espera = self._pausa_ate - agora
+                elif self._em_voo >= self.janela:
+                    espera = None                       # acorda no liberar()
+                elif self._tokens < 1:
+                    espera = (1 - self._tokens) / self.taxa
+                else:
+                    self._tokens -= 1
+                    self._em_voo += 1
+                    return
+                self._cond.wait(espera)
+
+    def liberar(self):
+        with self._cond:
+            self._em_voo -= 1
+            self._cond.notify_all()
+
+    # ── AIMD ──────────────────────────────────────────────────────────────
+    def sucesso(self):
+        with self._cond:
+            self._seguidos += 1
+            if self._seguidos >= self.aumento_a_cada:
+                self._seguidos = 0
+                self.janela = min(self.janela_max, self.janela + 1)
+                self.taxa = min(self.taxa_max, self.taxa + self.passo_taxa)
+                self._cond.notify_all()
+
+    def limitado(self, espera: float | None = None):
+        with self._cond:
+            agora = time.monotonic()
+            self._seguidos = 0
+            # várias chamadas em voo recusadas juntas contam como um só corte
+            if agora >= self._pausa_ate:
+                self.janela = max(self.janela_min, int(self.janela * self.fator_reducao))
+                self.taxa = max(self.taxa_min, self.taxa * self.fator_reducao)
+            self._tokens = min(self._tokens, 0.0)
+            self._pausa_ate = max(self._pausa_ate, agora + (espera or self.pausa_padrao))
+            log.warning("Cota da API excedida: janela=%d, taxa=%.2f/s, pausa %.1f s",
+                        self.janela, self.taxa, espera or self.pausa_padrao)
+
+    # ── uso ───────────────────────────────────────────────────────────────
+    def executar(self, funcao: Callable, *args):
+        """
+        funcao(*args) dentro do limite. LimiteExcedido reduz o ritmo e tenta
+        de novo (até `tentativas` vezes, depois propaga).
+        """
+        for tentativa in range(1, self.tentativas + 1):
+            self.adquirir()
+            try:
+                resultado = funcao(*args)
+            except LimiteExcedido as exc:
+                self.limitado(exc.espera)
+                if tentativa == self.tentativas:
+                    raise
+                continue
+            finally:
+                self.liberar()
+            self.sucesso()
+            return resultado
+
+    def mapear(self, funcao: Callable, itens: Iterable,
+               em_falha: Callable | None = None) -> list:
+        """
+        [funcao(item) …] em paralelo (até `janela_max` threads), na ordem de
+        `itens`. Item cuja cota não voltou após as novas tentativas recebe
+        em_falha(item) (sem `em_falha`, o LimiteExcedido propaga).
+        """
+        def um(item):
+            try:
+                return self.executar(funcao, item)
+            except LimiteExcedido:
+                if em_falha is None:
+                    raise
+                return em_falha(item)
+
+        itens = list(itens)
+        if len(itens) <= 1:
+            return [um(i) for i in itens]
+        with ThreadPoolExecutor(max_workers=min(self.janela_max, len(itens)),
+                                thread_name_prefix="limitador") as pool:
+            return list(pool.map(um, itens))
@@ -0,0 +1,19 @@
+import os
+import shutil
+
+
+def copiar_ou_vincular(origem: str, destino: str) -> str:
+    """
+    `copy_function` para shutil.copytree que cria hardlink em vez de copiar.
+
+    Os anexos vindos do Cloud_1 com store de blobs já são hardlinks; vincular
+    de novo nas pastas do cliente evita regravar os mesmos bytes. Se o link
+    não for possível (volumes diferentes, FS sem suporte), cai em copy2.
+    """
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+    return destino
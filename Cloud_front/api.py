@@ -88,6 +88,10 @@ def export_report(month: str = Query(..., regex=r"^\d{4}\-\d{2}$")):
                 "updated_at",
                 "last_try"
             ])
+            # colunas internas do Cloud_1 (epoch) — só existem após a migração
+            .drop(columns=["created_ts", "last_try_ts", "next_attempt_at",
+                           "lease_owner", "lease_expira", "versao"],
+                  errors="ignore")
         )
 
         df_tri = pd.read_sql_query(